@@ -1,6 +1,102 @@
+"""
+Print endpoints called by the POS page: receipt payloads (streamed for long
+invoices), printer pool routing and server-side network printing.
+"""
+import json
+
 import frappe
-from nextpos_printing.printing.receipt import render_invoice
+from frappe.utils import cint
+from werkzeug.wrappers import Response
+
+from nextpos_printing.printing import network
+from nextpos_printing.printing.escpos import build_print_job, payload_to_bytes
+from nextpos_printing.printing.optimizer import optimize_chunks
+from nextpos_printing.printing.receipt import STREAM_MIN_ITEMS, render_invoice, render_invoice_chunks
+from nextpos_printing.utils import printer_pool
+from nextpos_printing.utils.settings import get_printer_for_pos
+
+@frappe.whitelist()
+def get_print_payload(pos_invoice_name, stream=None):
+    """Return the QZ raw elements for an invoice.
+
+    Long invoices (or stream=1) are streamed as a chunked JSON response with
+    the same {"message": [...]} shape, one raw element per chunk.
+    """
+    if stream is None:
+        item_count = frappe.db.count("POS Invoice Item", {"parent": pos_invoice_name})
+        stream = item_count > STREAM_MIN_ITEMS
+
+    if not cint(stream):
+        return render_invoice(pos_invoice_name)
+
+    chunks = render_invoice_chunks(pos_invoice_name)
+    return Response(_stream_json_message(chunks), mimetype="application/json", direct_passthrough=True)
+
+
+def _stream_json_message(chunks):
+    # direct_passthrough hands these to the WSGI server as-is, so they must be bytes
+    yield b'{"message": ['
+    for idx, chunk in enumerate(chunks):
+        yield (("," if idx else "") + json.dumps(chunk)).encode()
+    yield b"]}"
+
+
+@frappe.whitelist()
+def acquire_printer(pos_profile=None, available=None):
+    """Return the printer config for pos_profile with a printer chosen from its pool.
+
+    available is the JSON list of printers the terminal can reach; pool
+    members it cannot see are skipped. The returned job_id must be passed
+    to release_printer once the job finishes. With no printer configured,
+    printer and job_id are None and the terminal picks its own printer.
+    """
+    config = dict(get_printer_for_pos(pos_profile))
+    printers = config.get("printers") or []
+
+    if available:
+        visible = set(frappe.parse_json(available))
+        printers = [p for p in printers if p in visible] or printers
+
+    config["printer"], config["job_id"] = printer_pool.acquire_printer(printers)
+    return config
+
 
 @frappe.whitelist()
-def get_print_payload(pos_invoice_name):
-    return render_invoice(pos_invoice_name)
\ No newline at end of file
+def release_printer(printer=None, job_id=None, ok=1, used=1):
+    """Finish a pooled job. used=0 means the terminal printed to another
+    printer, so the acquired one's health is left untouched."""
+    printer_pool.release_printer(printer, job_id, ok=bool(cint(ok)) if cint(used) else None)
+
+
+@frappe.whitelist()
+def get_pool_status(pos_profile=None):
+    config = get_printer_for_pos(pos_profile)
+    return printer_pool.get_pool_status(config.get("printers") or [])
+
+
+@frappe.whitelist()
+def print_network(pos_invoice_name, open_drawer=0):
+    """Render an invoice and queue it for a Network transport printer.
+
+    Returns as soon as the job is queued; a background job sends it and
+    reports the outcome to the printer pool.
+    """
+    pos_profile = frappe.db.get_value("POS Invoice", pos_invoice_name, "pos_profile")
+    config = get_printer_for_pos(pos_profile)
+    if config.get("transport") != "Network":
+        frappe.throw(f"POS Profile {pos_profile} is not mapped to a Network printer.")
+
+    settings = frappe.get_cached_doc("NextPOS Settings")
+    encoding = settings.encoding_type or "UTF-8"
+    elements = build_print_job(render_invoice_chunks(pos_invoice_name), config, bool(cint(open_drawer)))
+    if not settings.disable_payload_optimizer:
+        # Second pass over the whole job merges the receipt's last feeds with the cut feed
+        elements = optimize_chunks(elements)
+    data = payload_to_bytes(elements, encoding)
+
+    printer, job_id = printer_pool.acquire_printer(config.get("printers") or [])
+    if not printer:
+        frappe.throw(f"No network printer is configured for POS Profile {pos_profile}.")
+
+    network.enqueue_print_job(printer, data, job_id)
+    return {"queued": True, "printer": printer, "job_id": job_id}
@@ -15,6 +15,22 @@ from cryptography.x509.oid import NameOID
 import datetime
 
 
+# Parsed signing keys, keyed by their base64 PEM so a regenerated key is picked up
+_private_keys = {}
+
+
+def load_private_key(key_b64):
+    """Return the parsed RSA key for key_b64, parsing it once per process."""
+    private_key = _private_keys.get(key_b64)
+    if private_key is None:
+        private_key = load_pem_private_key(
+            base64.b64decode(key_b64), password=None, backend=default_backend()
+        )
+        _private_keys.clear()
+        _private_keys[key_b64] = private_key
+    return private_key
+
+
 @frappe.whitelist(allow_guest=True)
 def qz_get_certificate():
     """Return publisher certificate PEM (string) for QZ Tray."""
@@ -39,10 +55,7 @@ def qz_sign():
         )
 
     try:
-        key_bytes = base64.b64decode(key_b64)
-        private_key = load_pem_private_key(
-            key_bytes, password=None, backend=default_backend()
-        )
+        private_key = load_private_key(key_b64)
     except Exception as e:
         frappe.throw(f"Failed to load private key: {str(e)}")
 
@@ -9,3 +9,7 @@ def get_nextpos_settings():
 @frappe.whitelist()
 def get_printer_for_pos(pos_profile=None):
     return settings_utils.get_printer_for_pos(pos_profile)
+
+@frappe.whitelist()
+def get_client_settings(version=None):
+    return settings_utils.get_client_settings(version)
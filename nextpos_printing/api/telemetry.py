@@ -0,0 +1,8 @@
+# nextpos_printing/api/telemetry.py
+import frappe
+from nextpos_printing.utils import telemetry
+
+@frappe.whitelist(methods=["POST"])
+def report_print_timings(samples=None):
+    """Receive a batch of print phase timings beaconed from a POS terminal."""
+    return {"queued": telemetry.queue_samples(samples)}
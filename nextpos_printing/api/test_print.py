@@ -0,0 +1,44 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from nextpos_printing.api.print import get_print_payload
+from nextpos_printing.printing import receipt
+
+# Long enough to span several CHUNK_SIZE elements, with ESC/POS codes and padding
+LINES = ["\x1b@", "\x1bE\x01Empresa Lda\x1bE\x00"] + [
+    f"Produto {n:<30} {n % 7:>3} {n * 12.5:>10.2f}   " for n in range(1500)
+] + ["", "", "", "", "", "Obrigado"]
+
+
+class TestStreamedPrintPayload(unittest.TestCase):
+    def render(self, stream, disable_optimizer=0):
+        settings = frappe._dict(disable_payload_optimizer=disable_optimizer, debug_raw=0)
+        with patch.object(receipt, "load_receipt_context", return_value={"settings": settings}), patch.object(
+            receipt, "iter_receipt_lines", side_effect=lambda context: iter(LINES)
+        ):
+            return get_print_payload("ACC-PSINV-TEST", stream=stream)
+
+    def streamed_message(self, disable_optimizer=0):
+        response = self.render(1, disable_optimizer)
+        body = b"".join(response.response)
+        return json.loads(body)["message"]
+
+    def test_streamed_body_is_the_render_invoice_message(self):
+        for disable_optimizer in (0, 1):
+            expected = self.render(0, disable_optimizer)
+            message = self.streamed_message(disable_optimizer)
+
+            self.assertGreater(len(message), 1)
+            self.assertTrue(all(element["type"] == "raw" for element in message))
+            self.assertEqual("".join(element["data"] for element in message), expected[0]["data"])
+
+    def test_streamed_body_is_bytes(self):
+        response = self.render(1)
+        self.assertTrue(all(isinstance(part, bytes) for part in response.response))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+"""
+Bench commands for NextPOS Printing.
+"""
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("export-receipts")
+@click.option("--from-date", help="First posting date to include (YYYY-MM-DD)")
+@click.option("--to-date", help="Last posting date to include (YYYY-MM-DD)")
+@click.option("--pos-profile", help="Only export invoices from this POS Profile")
+@click.option("--format", "fmt", type=click.Choice(["text", "raw"]), default="text",
+              help="Plain text without ESC/POS codes, or the raw printer bytes")
+@click.option("--output", "output_dir", required=True, help="Directory for the batch files and manifest")
+@click.option("--workers", type=int, help="Worker processes (defaults to CPU count)")
+@pass_context
+def export_receipts(context, from_date, to_date, pos_profile, fmt, output_dir, workers):
+    """Render submitted POS Invoice receipts to compressed files for audits."""
+    import frappe
+    from nextpos_printing.printing.export import export_receipts as run_export
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        manifest = run_export(output_dir, from_date, to_date, pos_profile, fmt, workers)
+        click.echo(f"Exported {manifest['invoice_count']} receipts to {output_dir}")
+    finally:
+        frappe.destroy()
+
+
+commands = [export_receipts]
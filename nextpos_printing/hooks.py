@@ -7,10 +7,10 @@ app_license = "mit"
 
 #--------------------------------------------NextPOS Printing app additions start
 
+# qz-tray is loaded on demand from qz_tray.bundle.js by nextpos_pos.js
 page_js = {
     "point-of-sale": [
-        "public/js/nextpos_pos.js",
-        "public/js/qz-tray.js"
+        "public/js/nextpos_pos.js"
         ]
 }
 
@@ -18,6 +18,31 @@ app_include_css = ["/assets/nextpos_printing/css/nextpos__printing_custom.css"]
 
 #after_install = "nextpos_printing.install.create_default_settings"
 
+doc_events = {
+    "POS Opening Entry": {
+        "on_submit": "nextpos_printing.utils.warmup.warm_pos_caches"
+    },
+    "Company": {
+        "on_update": "nextpos_printing.printing.receipt.clear_company_info_cache"
+    },
+    "Address": {
+        "on_update": "nextpos_printing.printing.receipt.clear_company_info_cache"
+    },
+    "Customer": {
+        "on_update": "nextpos_printing.printing.receipt.clear_customer_info_cache"
+    },
+    "Contact": {
+        "on_update": "nextpos_printing.printing.receipt.clear_customer_info_cache"
+    }
+}
+
+scheduler_events = {
+    "all": [
+        "nextpos_printing.utils.telemetry.aggregate_queued_samples",
+        "nextpos_printing.utils.error_log.flush_error_log"
+    ]
+}
+
 
 
 
@@ -2,7 +2,11 @@ frappe.ui.form.on('NextPOS Printer Mapping', {
     printer: function(frm, cdt, cdn) {
         let row = locals[cdt][cdn];
         if (!row._printers_loaded) {
-            if (window.qz) {
+            frappe.require("qz_tray.bundle.js").then(() => {
+                if (!window.qz) {
+                    frappe.msgprint("QZ Tray not detected in browser.");
+                    return;
+                }
                 qz.printers.find().then(printers => {
                     let df = frappe.meta.get_docfield(cdt, "printer", cdn);
                     df.options = printers;
@@ -11,9 +15,7 @@ frappe.ui.form.on('NextPOS Printer Mapping', {
                 }).catch(err => {
                     frappe.msgprint("Could not fetch printers. Make sure QZ Tray is running.");
                 });
-            } else {
-                frappe.msgprint("QZ Tray not detected in browser.");
-            }
+            });
         }
     }
 });
@@ -1,8 +1,13 @@
 import frappe
 from frappe.model.document import Document
+from nextpos_printing.utils.settings import clear_settings_cache
 
 class NextPOSSettings(Document):
-    pass
+    def on_update(self):
+        # Resolved printer configs and client settings are rebuilt on the next
+        # read. Cleared after commit so a rolled-back save leaves them intact
+        # and no reader can cache the pre-save values in between.
+        frappe.db.after_commit.add(clear_settings_cache)
 
 
 @frappe.whitelist()
@@ -0,0 +1,17 @@
+frappe.query_reports["NextPOS Print Latency"] = {
+    filters: [
+        {
+            fieldname: "scope",
+            label: "Scope",
+            fieldtype: "Select",
+            options: "\nPrinter\nTerminal"
+        },
+        {
+            fieldname: "phase",
+            label: "Phase",
+            fieldtype: "Select",
+            options: "\npayload\nconnect\nprint\ndrawer\ntotal",
+            default: "total"
+        }
+    ]
+};
@@ -0,0 +1,35 @@
+# Copyright (c) 2025, Open Node Solutions
+# For license information, please see license.txt
+
+import frappe
+
+
+def execute(filters=None):
+    filters = filters or {}
+    conditions = {}
+    for field in ("scope", "phase"):
+        if filters.get(field):
+            conditions[field] = filters[field]
+
+    data = frappe.get_all(
+        "NextPOS Print Latency",
+        filters=conditions,
+        fields=["scope", "scope_key", "phase", "p50_ms", "p90_ms", "p99_ms", "max_ms",
+                "sample_count", "last_sample_on"],
+        order_by="p90_ms desc",
+    )
+    return get_columns(), data
+
+
+def get_columns():
+    return [
+        {"fieldname": "scope", "label": "Scope", "fieldtype": "Data", "width": 90},
+        {"fieldname": "scope_key", "label": "Printer / Terminal", "fieldtype": "Data", "width": 220},
+        {"fieldname": "phase", "label": "Phase", "fieldtype": "Data", "width": 90},
+        {"fieldname": "p50_ms", "label": "p50 (ms)", "fieldtype": "Int", "width": 90},
+        {"fieldname": "p90_ms", "label": "p90 (ms)", "fieldtype": "Int", "width": 90},
+        {"fieldname": "p99_ms", "label": "p99 (ms)", "fieldtype": "Int", "width": 90},
+        {"fieldname": "max_ms", "label": "Max (ms)", "fieldtype": "Int", "width": 90},
+        {"fieldname": "sample_count", "label": "Samples", "fieldtype": "Int", "width": 90},
+        {"fieldname": "last_sample_on", "label": "Last Sample", "fieldtype": "Datetime", "width": 160},
+    ]
@@ -0,0 +1,355 @@
+"""
+Virtual ESC/POS printer for NextPOS Printing.
+Interprets the ESC/POS subset this app emits, checks line widths against
+the paper width and estimates print time, without physical hardware.
+
+Library use:
+
+    report = emulate_payload(render_invoice(name), paper_width=48)
+
+TCP listener (benchmarks can target it like a network printer):
+
+    python -m nextpos_printing.printing.emulator --port 9100 --width 48
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+from nextpos_printing.printing.escpos import payload_to_bytes
+
+ESC = 0x1B
+GS = 0x1D
+LF = 0x0A
+CR = 0x0D
+
+DOTS_PER_MM = 8  # 203 dpi print heads
+LINE_HEIGHT_DOTS = 30  # default ESC 2 line spacing
+QR_HEIGHT_MM = 25  # rough height of a receipt QR code with quiet zone
+CUT_SECONDS = 0.3  # time the auto-cutter takes
+
+
+class VirtualPrinter:
+    """Feed it ESC/POS bytes, then read report().
+
+    paper_width is the characters per line the printer can fit (the
+    NextPOS Settings paper_width value). baud is the link speed used to
+    estimate transfer time; speed_mm_s is the print head feed speed.
+    """
+
+    def __init__(self, paper_width=48, baud=115200, speed_mm_s=250, encoding="utf-8"):
+        self.paper_width = paper_width
+        self.baud = baud
+        self.speed_mm_s = speed_mm_s
+        self.encoding = encoding
+        self._utf8 = encoding.lower().replace("-", "") == "utf8"
+        self.reset()
+
+    def reset(self):
+        self.bytes_received = 0
+        self.lines = []  # (text, columns) of every printed text line
+        self.wrapped = []  # lines that exceed the paper width
+        self.feed_dots = 0
+        self.cuts = 0
+        self.drawer_kicks = []
+        self.qr_codes = 0
+        self.raster_dots = 0
+        self.style_toggles = 0
+        self.code_page = 0
+        self.unknown = []
+        self._bold = False
+        self._width_mult = 1
+        self._height_mult = 1
+        self._line = bytearray()
+        self._line_columns = 0
+        self._line_height = 1
+        self._buffer = bytearray()
+
+    # ---------- input ----------
+    def feed(self, data):
+        """Interpret a chunk of printer data (bytes, or str encoded with self.encoding)."""
+        if isinstance(data, str):
+            data = data.encode(self.encoding)
+        self.bytes_received += len(data)
+        self._buffer.extend(data)
+        self._parse()
+
+    def finish(self):
+        """Flush a trailing line that was not terminated with LF."""
+        if self._line:
+            self._end_line()
+
+    # ---------- parsing ----------
+    def _parse(self):
+        buf = self._buffer
+        i = 0
+        while i < len(buf):
+            byte = buf[i]
+            if byte == ESC or byte == GS:
+                consumed = self._command(buf, i)
+                if consumed is None:  # incomplete command, wait for more data
+                    break
+                i += consumed
+            elif byte == LF:
+                self._end_line()
+                i += 1
+            elif byte == CR:
+                i += 1
+            else:
+                self._line.append(byte)
+                # UTF-8 continuation bytes belong to the previous character
+                if not (self._utf8 and 0x80 <= byte < 0xC0):
+                    self._line_columns += self._width_mult
+                self._line_height = max(self._line_height, self._height_mult)
+                i += 1
+        del buf[:i]
+
+    def _command(self, buf, i):
+        """Handle the command starting at buf[i]; return bytes consumed or None if incomplete."""
+        if i + 1 >= len(buf):
+            return None
+        prefix, cmd = buf[i], buf[i + 1]
+
+        def arg(n):
+            return buf[i + 2 + n] if i + 2 + n < len(buf) else None
+
+        if prefix == ESC:
+            if cmd == ord("@"):
+                self._bold, self._width_mult, self._height_mult = False, 1, 1
+                return 2
+            if cmd == ord("2"):  # default line spacing
+                return 2
+            if cmd in (ord("E"), ord("!"), ord("d"), ord("t"), ord("3"), ord("a")):
+                n = arg(0)
+                if n is None:
+                    return None
+                self._esc_one_arg(chr(cmd), n)
+                return 3
+            if cmd == ord("p"):
+                if arg(2) is None:
+                    return None
+                self.drawer_kicks.append({"pin": arg(0), "on_ms": arg(1) * 2, "off_ms": arg(2) * 2})
+                return 5
+        else:
+            if cmd == ord("V"):
+                m = arg(0)
+                if m is None:
+                    return None
+                self._flush_partial_line()
+                self.cuts += 1
+                if m in (65, 66):  # cut with feed: GS V m n
+                    if arg(1) is None:
+                        return None
+                    self.feed_dots += arg(1)
+                    return 4
+                return 3
+            if cmd == ord("!"):
+                n = arg(0)
+                if n is None:
+                    return None
+                self._width_mult = ((n >> 4) & 0x07) + 1
+                self._height_mult = (n & 0x07) + 1
+                self.style_toggles += 1
+                return 3
+            if cmd == ord("(") and arg(0) == ord("k"):
+                # GS ( k pL pH cn fn ... : QR / 2D symbol commands
+                if arg(2) is None:
+                    return None
+                length = arg(1) + arg(2) * 256
+                total = 5 + length
+                if i + total > len(buf):
+                    return None
+                fn = buf[i + 6] if length >= 2 else None
+                if fn == 81:  # print the stored symbol
+                    self._flush_partial_line()
+                    self.qr_codes += 1
+                    self.feed_dots += QR_HEIGHT_MM * DOTS_PER_MM
+                return total
+            if cmd == ord("v") and arg(0) == ord("0"):
+                # GS v 0 m xL xH yL yH d1...dk : raster bit image
+                if arg(5) is None:
+                    return None
+                width_bytes = arg(2) + arg(3) * 256
+                height = arg(4) + arg(5) * 256
+                total = 8 + width_bytes * height
+                if i + total > len(buf):
+                    return None
+                self._flush_partial_line()
+                self.raster_dots += height
+                self.feed_dots += height
+                return total
+
+        self.unknown.append(f"{'ESC' if prefix == ESC else 'GS'} 0x{cmd:02X}")
+        return 2
+
+    def _esc_one_arg(self, cmd, n):
+        if cmd == "E":
+            self._bold = bool(n & 1)
+            self.style_toggles += 1
+        elif cmd == "!":
+            self._bold = bool(n & 0x08)
+            self._height_mult = 2 if n & 0x10 else 1
+            self._width_mult = 2 if n & 0x20 else 1
+            self.style_toggles += 1
+        elif cmd == "d":
+            if self._line:
+                # Like LF, the first fed line is the one that prints the pending text
+                self._end_line()
+                n = max(n - 1, 0)
+            self.feed_dots += n * LINE_HEIGHT_DOTS
+        elif cmd == "t":
+            self.code_page = n
+        # ESC 3 (line spacing) and ESC a (justification) don't affect the checks
+
+    # ---------- lines ----------
+    def _flush_partial_line(self):
+        # Feeds and cuts print whatever is in the line buffer first
+        if self._line:
+            self._end_line()
+
+    def _end_line(self):
+        text = self._line.decode(self.encoding, errors="replace")
+        columns = self._line_columns
+        self.lines.append((text, columns))
+        if columns > self.paper_width:
+            self.wrapped.append({"line": len(self.lines), "columns": columns, "text": text})
+        # A wrapped line prints as several physical lines
+        physical = max(1, -(-columns // self.paper_width))
+        self.feed_dots += physical * LINE_HEIGHT_DOTS * self._line_height
+        self._line = bytearray()
+        self._line_columns = 0
+        self._line_height = 1
+
+    # ---------- results ----------
+    def report(self):
+        """Summarise everything fed so far."""
+        self.finish()
+        paper_mm = self.feed_dots / DOTS_PER_MM
+        transfer_s = self.bytes_received * 10 / self.baud if self.baud else 0  # 8N1 framing
+        mechanical_s = paper_mm / self.speed_mm_s + self.cuts * CUT_SECONDS
+        return {
+            "bytes": self.bytes_received,
+            "lines": len(self.lines),
+            "max_columns": max((cols for _text, cols in self.lines), default=0),
+            "paper_width": self.paper_width,
+            "wrapped_lines": self.wrapped,
+            "paper_mm": round(paper_mm, 1),
+            "cuts": self.cuts,
+            "drawer_kicks": self.drawer_kicks,
+            "qr_codes": self.qr_codes,
+            "raster_dots": self.raster_dots,
+            "style_toggles": self.style_toggles,
+            "code_page": self.code_page,
+            "unknown_commands": self.unknown,
+            "transfer_seconds": round(transfer_s, 3),
+            "mechanical_seconds": round(mechanical_s, 3),
+            # The printer buffers data, so transfer and printing overlap
+            "estimated_seconds": round(max(transfer_s, mechanical_s), 3),
+        }
+
+
+def emulate_payload(payload, paper_width=48, baud=115200, speed_mm_s=250, encoding="utf-8"):
+    """Run QZ raw elements through a fresh VirtualPrinter and return its report."""
+    printer = VirtualPrinter(paper_width, baud, speed_mm_s, encoding)
+    printer.feed(payload_to_bytes(payload, encoding))
+    return printer.report()
+
+
+# ---------- TCP 9100 listener ----------
+class _JobHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        printer = VirtualPrinter(server.paper_width, server.baud, server.speed_mm_s, server.encoding)
+        self.request.settimeout(server.idle_timeout)
+        while True:
+            try:
+                chunk = self.request.recv(65536)
+            except OSError:  # idle timeout ends the job, like a real printer
+                break
+            if not chunk:
+                break
+            printer.feed(chunk)
+        report = printer.report()
+        if server.simulate_speed:
+            time.sleep(report["estimated_seconds"])
+        server.record(report)
+
+
+class VirtualPrinterServer(socketserver.ThreadingTCPServer):
+    """TCP listener that treats every connection as one print job."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 9100), paper_width=48, baud=115200, speed_mm_s=250,
+                 encoding="utf-8", idle_timeout=2.0, simulate_speed=False, on_job=None):
+        super().__init__(address, _JobHandler)
+        self.paper_width = paper_width
+        self.baud = baud
+        self.speed_mm_s = speed_mm_s
+        self.encoding = encoding
+        self.idle_timeout = idle_timeout
+        self.simulate_speed = simulate_speed
+        self.on_job = on_job
+        self.reports = []
+        self._lock = threading.Lock()
+
+    def record(self, report):
+        with self._lock:
+            self.reports.append(report)
+        if self.on_job:
+            self.on_job(report)
+
+    def stats(self):
+        """Totals across every job received so far."""
+        with self._lock:
+            reports = list(self.reports)
+        return {
+            "jobs": len(reports),
+            "bytes": sum(r["bytes"] for r in reports),
+            "wrapped_lines": sum(len(r["wrapped_lines"]) for r in reports),
+            "estimated_seconds": round(sum(r["estimated_seconds"] for r in reports), 3),
+        }
+
+    def start_in_thread(self):
+        """Serve in a background thread (for tests); returns the thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual ESC/POS printer listening on TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--width", type=int, default=48, help="characters per line")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--speed", type=float, default=250, help="print speed in mm/s")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--simulate-speed", action="store_true",
+                        help="hold each job for its estimated print time")
+    args = parser.parse_args()
+
+    def log_job(report):
+        print(
+            f"job: {report['bytes']} bytes, {report['lines']} lines, "
+            f"{len(report['wrapped_lines'])} wrapped, ~{report['estimated_seconds']}s",
+            flush=True,
+        )
+
+    server = VirtualPrinterServer(
+        (args.host, args.port), args.width, args.baud, args.speed, args.encoding,
+        simulate_speed=args.simulate_speed, on_job=log_job,
+    )
+    print(f"Virtual printer listening on {args.host}:{args.port} ({args.width} chars/line)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.stats())
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+ESC/POS command builders shared by the server-side transports.
+Free of Frappe imports so the virtual printer can use it standalone.
+"""
+import base64
+
+FULL_CUT = "\x1DV\x00"
+PARTIAL_CUT = "\x1DV\x01"
+
+
+def feed_lines(n):
+    """ESC d n: print the buffer and feed n lines."""
+    return "\x1Bd" + chr(n)
+
+
+def cut_command(cut_mode, feed_before_cut=0):
+    """Feed and cut sequence for a NextPOS cut mode (same as the POS page builds)."""
+    if not cut_mode or cut_mode == "None":
+        return ""
+    data = feed_lines(int(feed_before_cut)) if feed_before_cut and int(feed_before_cut) > 0 else ""
+    if cut_mode == "Full Cut":
+        data += FULL_CUT
+    elif cut_mode == "Partial Cut":
+        data += PARTIAL_CUT
+    return data
+
+
+def drawer_command(pin):
+    """ESC p m t1 t2: kick the cash drawer on pin m with 100ms pulses."""
+    return "\x1Bp" + chr(int(pin or 0)) + "\x32\x32"
+
+
+def build_print_job(payload, config, open_drawer=False):
+    """Wrap rendered receipt elements with copies, cut and drawer commands from a printer config."""
+    elements = list(payload)
+    cut = cut_command(config.get("cut_mode"), config.get("feed_before_cut"))
+    if cut:
+        elements.append({"type": "raw", "data": cut})
+    elements = elements * max(1, int(config.get("print_copies") or 1))
+    if open_drawer and config.get("open_cash_drawer"):
+        elements.append({"type": "raw", "data": drawer_command(config.get("drawer_pin"))})
+    return elements
+
+
+def payload_to_bytes(payload, encoding="utf-8"):
+    """Convert QZ raw elements (as returned by get_print_payload) to printer bytes."""
+    if isinstance(payload, (dict, str, bytes)):
+        payload = [payload]
+    data = bytearray()
+    for element in payload:
+        if isinstance(element, bytes):
+            data.extend(element)
+            continue
+        if isinstance(element, str):
+            data.extend(element.encode(encoding, errors="replace"))
+            continue
+        fmt = element.get("format") or "plain"
+        raw = element.get("data") or ""
+        if fmt == "hex":
+            data.extend(bytes.fromhex(raw))
+        elif fmt == "base64":
+            data.extend(base64.b64decode(raw))
+        else:
+            data.extend(raw.encode(encoding, errors="replace"))
+    return bytes(data)
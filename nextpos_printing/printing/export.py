@@ -0,0 +1,127 @@
+"""
+Bulk receipt export for audits.
+Renders ranges of POS Invoices across a process pool and writes gzip
+compressed batch files plus a manifest describing where each receipt lives.
+"""
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import frappe
+from frappe.utils import now
+
+from nextpos_printing.printing.optimizer import optimize_escpos
+from nextpos_printing.printing.receipt import iter_receipt_lines, load_receipt_context, strip_escpos
+from nextpos_printing.utils.settings import get_printer_configs
+
+BATCH_SIZE = 500  # invoices per output file / worker task
+FORMATS = ("text", "raw")
+
+
+def get_invoice_names(from_date=None, to_date=None, pos_profile=None):
+    """Return submitted POS Invoice names matching the export filters, in posting order."""
+    filters = {"docstatus": 1}
+    if from_date and to_date:
+        filters["posting_date"] = ["between", [from_date, to_date]]
+    elif from_date:
+        filters["posting_date"] = [">=", from_date]
+    elif to_date:
+        filters["posting_date"] = ["<=", to_date]
+    if pos_profile:
+        filters["pos_profile"] = pos_profile
+
+    return frappe.get_all(
+        "POS Invoice", filters=filters, pluck="name", order_by="posting_date asc, name asc"
+    )
+
+
+def export_receipts(output_dir, from_date=None, to_date=None, pos_profile=None, fmt="text", workers=None):
+    """Render every matching invoice to compressed batch files in output_dir.
+
+    Must be called with a connected site. Returns the manifest dict, which is
+    also written to output_dir/manifest.json.
+    """
+    if fmt not in FORMATS:
+        frappe.throw(f"Unknown export format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+    if not (from_date or to_date or pos_profile):
+        frappe.throw("Give a date range or a POS Profile to export.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    names = get_invoice_names(from_date, to_date, pos_profile)
+    batches = [names[i:i + BATCH_SIZE] for i in range(0, len(names), BATCH_SIZE)]
+    encoding = frappe.db.get_single_value("NextPOS Settings", "encoding_type") or "UTF-8"
+
+    # Warm the shared Redis caches once so workers don't all rebuild them
+    get_printer_configs()
+
+    entries = []
+    if batches:
+        workers = min(workers or os.cpu_count() or 1, len(batches))
+        # spawn, not fork: each worker must open its own DB connection
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(frappe.local.site, frappe.local.sites_path),
+        ) as pool:
+            futures = [
+                pool.submit(_render_batch, idx, batch, fmt, encoding, output_dir)
+                for idx, batch in enumerate(batches, 1)
+            ]
+            for future in futures:
+                entries.extend(future.result())
+
+    manifest = {
+        "site": frappe.local.site,
+        "generated_on": now(),
+        "format": fmt,
+        "encoding": encoding,
+        "filters": {"from_date": from_date, "to_date": to_date, "pos_profile": pos_profile},
+        "invoice_count": len(entries),
+        "bytes_saved": sum(entry["bytes_saved"] for entry in entries),
+        "receipts": entries,
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def _init_worker(site, sites_path):
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+
+
+def _render_batch(batch_no, names, fmt, encoding, output_dir):
+    """Render one batch into a single gzip file and return its manifest entries.
+
+    Offsets and lengths refer to the uncompressed byte stream of the file.
+    """
+    filename = f"receipts-{batch_no:05d}.{'txt' if fmt == 'text' else 'bin'}.gz"
+    entries = []
+    offset = 0
+    with gzip.open(os.path.join(output_dir, filename), "wb") as out:
+        for name in names:
+            context = load_receipt_context(name)
+            text = "\n".join(iter_receipt_lines(context))
+            bytes_saved = 0
+            if fmt == "text":
+                data = (strip_escpos(text) + "\n\f\n").encode("utf-8")
+            else:
+                if not context["settings"].get("disable_payload_optimizer"):
+                    text, stats = optimize_escpos(text)
+                    bytes_saved = stats["bytes_saved"]
+                data = text.encode(encoding, errors="replace")
+            out.write(data)
+            entries.append({
+                "invoice": name,
+                "file": filename,
+                "offset": offset,
+                "length": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "bytes_saved": bytes_saved,
+            })
+            offset += len(data)
+    return entries
@@ -0,0 +1,80 @@
+"""
+Declarative receipt layouts per paper width.
+Each template is compiled once into precomputed rules, format strings and
+static lines, so rendering a receipt only fills values into the plan.
+"""
+
+# Keyed by the NextPOS Settings paper_width option (characters per line).
+# Widths keep a safety margin below the nominal value to prevent wrapping.
+LAYOUT_TEMPLATES = {
+    42: {
+        "text_width": 36,  # free text (company name, footer, contact)
+        "rule_width": 40,  # dashed/solid separators
+        "table_width": 40,  # item table and totals
+        "columns": (22, 3),  # description, quantity; value takes the rest
+        "tax_label_width": 15,
+    },
+    48: {
+        "text_width": 40,
+        "rule_width": 46,
+        "table_width": 44,
+        "columns": (26, 3),
+        "tax_label_width": 15,
+    },
+    80: {
+        "text_width": 72,
+        "rule_width": 78,
+        "table_width": 76,
+        "columns": (50, 5),
+        "tax_label_width": 30,
+    },
+}
+
+BOLD_ON = "\x1BE\x01"
+BOLD_OFF = "\x1BE\x00"
+DOUBLE_HEIGHT_ON = "\x1B!\x10"
+DOUBLE_HEIGHT_OFF = "\x1B!\x00"
+
+
+def compile_layout(width, flags, footer_lines):
+    """Compile the template for width into a render plan.
+
+    flags holds the NextPOS Settings layout checkboxes (wrap_long_names,
+    show_tax, show_cashier, show_address); footer_lines must already be
+    cleaned and truncated to the template's text width.
+    """
+    template = LAYOUT_TEMPLATES.get(width) or LAYOUT_TEMPLATES[48]
+    text_width = template["text_width"]
+    table_width = template["table_width"]
+    desc_width, qty_width = template["columns"]
+    value_width = table_width - desc_width - qty_width - 2  # 2 spaces between columns
+    row_format = f"{{:<{desc_width}.{desc_width}}} {{:>{qty_width}}} {{:>{value_width}}}"
+
+    return {
+        "width": width,
+        "text_width": text_width,
+        "table_width": table_width,
+        "desc_width": desc_width,
+        "tax_label_width": template["tax_label_width"],
+        "row_format": row_format,
+        "dashed": "-" * template["rule_width"],
+        "solid": "=" * template["rule_width"],
+        "table_header": BOLD_ON + row_format.format("Descricao", "Qtd", "Valor") + BOLD_OFF,
+        "total_due_label": BOLD_ON + "TOTAL A PAGAR"[:text_width] + BOLD_OFF,
+        "processed_by": "Processado por Computador"[:text_width],
+        "status_final": "**** FATURA FINAL ****"[:text_width].strip(),
+        "status_draft": "**** FATURA RASCUNHO ****"[:text_width].strip(),
+        "footer_lines": list(footer_lines),
+        "wrap_long_names": bool(flags.get("wrap_long_names")),
+        "show_tax": bool(flags.get("show_tax")),
+        "show_cashier": bool(flags.get("show_cashier")),
+        "show_address": bool(flags.get("show_address")),
+    }
+
+
+def total_line(layout, label, amount):
+    """Left-align label and right-align amount across the table width."""
+    label_width = layout["table_width"] - len(amount)
+    if label_width > 0:
+        return label.ljust(label_width) + amount
+    return label + " " + amount
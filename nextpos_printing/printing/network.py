@@ -0,0 +1,138 @@
+"""
+Direct network printing over raw TCP (port 9100) for NextPOS Printing.
+Jobs run on Frappe's background queue, so they are kept in Redis and
+survive web worker restarts, and web requests never wait on the printer.
+
+Most ESC/POS network cards accept a single client at a time, so a job
+holds a Redis lock for its printer while it connects, sends and closes.
+"""
+import contextlib
+import socket
+import time
+
+import frappe
+
+from nextpos_printing.utils import printer_pool
+
+DEFAULT_PORT = 9100
+CONNECT_TIMEOUT = 3  # seconds
+WRITE_TIMEOUT = 10  # seconds for a whole sendall() before giving up
+MAX_RETRIES = 3  # connection attempts per job
+RETRY_DELAY = 0.5  # seconds, doubled per attempt
+# Longer than one job's connect retries plus write timeout, so the lock
+# never expires while in use
+PRINTER_LOCK_TIMEOUT = 60
+PRINTER_LOCK_WAIT = 30  # seconds to wait for another job on the same printer
+PRINTER_LOCK_KEY = "nextpos_printer_lock"
+# Dedicated queue, used when the bench runs a worker for it (see README);
+# otherwise jobs go to the standard "short" queue
+PRINT_QUEUE = "nextpos_print"
+JOB_TIMEOUT = 120  # seconds
+
+
+def parse_address(printer):
+    """Split "host:port" (port optional, default 9100) into (host, port)."""
+    host, _sep, port = (printer or "").strip().rpartition(":")
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+class PrinterConnection:
+    """A TCP connection to one printer."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.sock = None
+
+    def connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(WRITE_TIMEOUT)
+        self.sock = sock
+
+    def send(self, data):
+        try:
+            self.sock.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+def send_with_retry(connection, data):
+    """Send data, returning None or the error.
+
+    Only connecting is retried: once sendall() started, the printer may
+    already be printing, and resending would print a partial receipt
+    followed by a full one.
+    """
+    for attempt in range(MAX_RETRIES):
+        try:
+            connection.connect()
+            break
+        except OSError as e:
+            if attempt == MAX_RETRIES - 1:
+                return e
+            time.sleep(RETRY_DELAY * 2 ** attempt)
+
+    try:
+        connection.send(data)
+    except OSError as e:
+        return e
+    return None
+
+
+def send_to_printer(address, data):
+    """Connect to the printer at address, send data and disconnect. Returns None or the error."""
+    connection = PrinterConnection(*parse_address(address))
+    try:
+        return send_with_retry(connection, data)
+    finally:
+        connection.close()
+
+
+def get_print_queue():
+    workers = frappe.conf.get("workers") or {}
+    return PRINT_QUEUE if PRINT_QUEUE in workers else "short"
+
+
+def enqueue_print_job(address, data, job_id=None):
+    """Queue raw bytes for the printer at address; job_id is its printer pool job."""
+    frappe.enqueue(
+        "nextpos_printing.printing.network.send_print_job",
+        queue=get_print_queue(),
+        timeout=JOB_TIMEOUT,
+        address=address,
+        data=data,
+        job_id=job_id,
+    )
+
+
+def send_print_job(address, data, job_id=None):
+    """Background job: send one print job and report the outcome to the printer pool."""
+    lock = frappe.cache().lock(f"{PRINTER_LOCK_KEY}:{address}", timeout=PRINTER_LOCK_TIMEOUT)
+    try:
+        if lock.acquire(blocking_timeout=PRINTER_LOCK_WAIT):
+            try:
+                error = send_to_printer(address, data)
+            finally:
+                with contextlib.suppress(Exception):
+                    lock.release()
+        else:
+            error = TimeoutError(f"Printer {address} is busy")
+    except Exception as e:  # Redis unavailable
+        error = e
+
+    printer_pool.release_printer(address, job_id, ok=error is None)
+    if error:
+        frappe.logger("nextpos_printing").error(f"Network print to {address} failed: {error}")
@@ -0,0 +1,192 @@
+"""
+Payload-size optimizer for rendered ESC/POS output.
+Drops redundant bold toggles, trailing spaces and long runs of line feeds
+without changing what the printer prints. Works on a stream of chunks so
+it can sit behind the chunked renderer.
+"""
+
+ESC = "\x1b"
+GS = "\x1d"
+# Payloads are sent as UTF-8, where chr(n) above 127 becomes two bytes
+MAX_FEED = 127
+
+
+class EscPosOptimizer:
+    """Feed rendered text with feed(), then call finish(); both return optimized text.
+
+    - ESC E (bold) is emitted lazily, right before the next visible character,
+      so "bold off, newline, bold on" pairs cancel out.
+    - ESC ! (print mode) is kept in place but deduplicated.
+    - Spaces before a line feed are dropped.
+    - After the LF that ends a line, MIN_FEED_RUN or more blank line feeds
+      (and ESC d feeds next to them) become a single ESC d n.
+    """
+
+    MIN_FEED_RUN = 4  # ESC d n is 3 bytes, so shorter runs stay as LFs
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._desired_bold = False
+        self._emitted_bold = False
+        self._mode = 0
+        self._spaces = 0
+        self._feeds = 0
+        self._tail = ""  # incomplete command carried over to the next chunk
+
+    # ---------- public ----------
+    def feed(self, text):
+        self.bytes_in += len(text.encode("utf-8"))
+        text = self._tail + text
+        self._tail = ""
+        out = []
+        i = 0
+        n = len(text)
+        while i < n:
+            ch = text[i]
+            if ch == ESC or ch == GS:
+                length = self._command_length(text, i)
+                if length is None:
+                    self._tail = text[i:]
+                    break
+                self._command(text[i:i + length], out)
+                i += length
+            elif ch == "\n":
+                self._spaces = 0
+                self._feeds += 1
+                i += 1
+            elif ch == " ":
+                self._spaces += 1
+                i += 1
+            else:
+                self._flush_feeds(out)
+                self._flush_bold(out)
+                self._flush_spaces(out)
+                out.append(ch)
+                i += 1
+        return self._emit(out)
+
+    def finish(self):
+        out = [self._tail]
+        self._tail = ""
+        self._spaces = 0  # trailing spaces at the very end
+        self._flush_feeds(out)
+        # Leave the printer in the style the renderer asked for
+        self._flush_bold(out)
+        return self._emit(out)
+
+    def stats(self):
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+        }
+
+    # ---------- internals ----------
+    def _emit(self, out):
+        text = "".join(out)
+        self.bytes_out += len(text.encode("utf-8"))
+        return text
+
+    def _command_length(self, text, i):
+        """Length of the ESC/GS command at text[i], or None if it is cut off."""
+        n = len(text)
+        if i + 1 >= n:
+            return None
+        prefix, cmd = text[i], text[i + 1]
+        if prefix == ESC:
+            if cmd in "@2":
+                return 2
+            if cmd in "E!dt3aM-":
+                return 3 if i + 2 < n else None
+            if cmd == "p":
+                return 5 if i + 4 < n else None
+            return 2
+        if cmd in "!":
+            return 3 if i + 2 < n else None
+        if cmd == "V":
+            if i + 2 >= n:
+                return None
+            length = 4 if ord(text[i + 2]) in (65, 66) else 3
+            return length if i + length <= n else None
+        if cmd == "(":
+            if i + 4 >= n:
+                return None
+            length = 5 + ord(text[i + 3]) + ord(text[i + 4]) * 256
+            return length if i + length <= n else None
+        if cmd == "v":
+            if i + 7 >= n:
+                return None
+            width = ord(text[i + 4]) + ord(text[i + 5]) * 256
+            height = ord(text[i + 6]) + ord(text[i + 7]) * 256
+            length = 8 + width * height
+            return length if i + length <= n else None
+        return 2
+
+    def _command(self, command, out):
+        kind = command[:2]
+        if kind == ESC + "E":
+            self._desired_bold = bool(ord(command[2]) & 1)
+        elif kind == ESC + "!":
+            mode = ord(command[2])
+            if mode != self._mode or self._emitted_bold != bool(mode & 0x08):
+                # Spaces already seen belong to the old print mode
+                self._flush_feeds(out)
+                self._flush_spaces(out)
+                out.append(command)
+                self._mode = mode
+                self._emitted_bold = bool(mode & 0x08)
+            self._desired_bold = bool(mode & 0x08)
+        elif kind == ESC + "d":
+            self._spaces = 0
+            self._feeds += ord(command[2])
+        else:
+            # Anything else (drawer, cut, code page, images) goes out as-is, in order
+            self._flush_feeds(out)
+            self._flush_spaces(out)
+            if kind == ESC + "@":
+                self._desired_bold = self._emitted_bold = False
+                self._mode = 0
+            out.append(command)
+
+    def _flush_feeds(self, out):
+        feeds, self._feeds = self._feeds, 0
+        if feeds <= self.MIN_FEED_RUN:
+            out.append("\n" * feeds)
+            return
+        # The first LF ends the pending text line; only the blank lines after it collapse
+        out.append("\n")
+        feeds -= 1
+        while feeds > 0:
+            step = min(feeds, MAX_FEED)
+            out.append(ESC + "d" + chr(step))
+            feeds -= step
+
+    def _flush_spaces(self, out):
+        if self._spaces:
+            out.append(" " * self._spaces)
+            self._spaces = 0
+
+    def _flush_bold(self, out):
+        if self._desired_bold != self._emitted_bold:
+            out.append(ESC + "E" + ("\x01" if self._desired_bold else "\x00"))
+            self._emitted_bold = self._desired_bold
+
+
+def optimize_escpos(text):
+    """Optimize a complete rendered receipt. Returns (text, stats)."""
+    optimizer = EscPosOptimizer()
+    result = optimizer.feed(text) + optimizer.finish()
+    return result, optimizer.stats()
+
+
+def optimize_chunks(chunks, optimizer=None):
+    """Optimize a stream of QZ raw elements, keeping one element per non-empty chunk."""
+    optimizer = optimizer or EscPosOptimizer()
+    for chunk in chunks:
+        data = optimizer.feed(chunk["data"])
+        if data:
+            yield {"type": "raw", "data": data}
+    data = optimizer.finish()
+    if data:
+        yield {"type": "raw", "data": data}
@@ -1,8 +1,34 @@
 import frappe
 import re
 import datetime
+import textwrap
+from nextpos_printing.printing.layout import (
+    BOLD_OFF,
+    BOLD_ON,
+    DOUBLE_HEIGHT_OFF,
+    DOUBLE_HEIGHT_ON,
+    LAYOUT_TEMPLATES,
+    compile_layout,
+    total_line,
+)
+from nextpos_printing.printing.optimizer import optimize_chunks, optimize_escpos
+from nextpos_printing.utils.error_log import log_error
+from nextpos_printing.utils.settings import get_printer_for_pos
+
+# ESC/POS control sequences emitted by this module (style, feed, drawer, cut)
+ESCPOS_CONTROL_RE = re.compile(r"\x1b[E!dt].|\x1bp...|\x1dV.", re.S)
 
 DEFAULT_WIDTH = 48  # characters per line for 80mm thermal (adjusted from 42)
+CHUNK_SIZE = 16 * 1024  # characters per raw element when streaming
+STREAM_MIN_ITEMS = 200  # invoices with more lines than this are streamed
+COMPANY_INFO_CACHE_KEY = "nextpos_company_info"
+CUSTOMER_INFO_CACHE_KEY = "nextpos_customer_info"
+COMPANY_INFO_TTL = 24 * 60 * 60  # seconds; Company and Address saves also clear it
+CUSTOMER_INFO_TTL = 6 * 60 * 60  # seconds; Customer saves also clear it
+LAYOUT_FLAGS = ("wrap_long_names", "show_tax", "show_cashier", "show_address")
+
+# Compiled layouts per paper width for the current settings version, local to this process
+_compiled_layouts = {"version": None, "layouts": {}}
 
 
 def wrap_text(text: str, width: int = DEFAULT_WIDTH):
@@ -28,16 +54,21 @@ def format_custom_block(text: str, width: int):
     # Strip remaining HTML tags
     clean = frappe.utils.strip_html_tags(clean or "")
 
-    # Split and truncate to safe width (40 chars)
+    # Split and truncate to the layout's safe text width
     formatted = []
     for ln in [ln.strip() for ln in clean.split("\n") if ln.strip()]:
-        # Truncate each line to 40 chars max to prevent wrapping
-        truncated = ln[:40].strip()
+        # Truncate each line to prevent wrapping
+        truncated = ln[:width].strip()
         if truncated:
             formatted.append(truncated)
     return formatted
 
 
+def strip_escpos(text: str):
+    """Remove ESC/POS control sequences, leaving the printable receipt text."""
+    return ESCPOS_CONTROL_RE.sub("", text)
+
+
 def format_amount(amount, include_currency=False):
     """Format amount with proper decimal places and optional currency."""
     formatted = f"{amount:,.2f}"
@@ -79,18 +110,24 @@ def format_table_row(col1, col2, col3, width, col1_width, col2_width):
     return f"{col1_text} {col2_text} {col3_text}"
 
 
-def get_company_info(company_name):
-    """Retrieve company information."""
+def get_company_info(company_name, raise_errors=False):
+    """Retrieve company information.
+
+    Falls back to the bare company name on any error, unless raise_errors
+    is set.
+    """
     try:
-        company = frappe.get_doc("Company", company_name)
+        company = frappe.get_cached_doc("Company", company_name)
         return {
             "name": company.company_name or company_name,
-            "address": get_company_address(company),
+            "address": get_company_address(company, raise_errors=raise_errors),
             "tax_id": company.tax_id or "",
             "phone": company.phone_no or "",
             "email": company.email or ""
         }
-    except:
+    except Exception:
+        if raise_errors:
+            raise
         return {
             "name": company_name,
             "address": "",
@@ -100,7 +137,7 @@ def get_company_info(company_name):
         }
 
 
-def get_company_address(company):
+def get_company_address(company, raise_errors=False):
     """Get formatted company address."""
     try:
         # Try to get default company address
@@ -115,22 +152,88 @@ def get_company_address(company):
         )
         
         if address_links:
-            address = frappe.get_doc("Address", address_links[0].parent)
+            address = frappe.get_cached_doc("Address", address_links[0].parent)
             parts = []
             if address.address_line1:
                 parts.append(address.address_line1)
             if address.city:
                 parts.append(address.city)
             return ", ".join(parts) if parts else ""
-    except:
-        pass
+    except Exception:
+        if raise_errors:
+            raise
     return ""
 
 
-def get_customer_tax_id(customer_name):
+def get_cached_company_info(company_name):
+    """get_company_info, cached in Redis per company.
+
+    Failed lookups print the bare company name but are not cached, so a
+    transient error only affects the current receipt.
+    """
+    key = f"{COMPANY_INFO_CACHE_KEY}:{company_name}"
+    info = frappe.cache().get_value(key)
+    if info is not None:
+        return info
+
+    try:
+        info = get_company_info(company_name, raise_errors=True)
+    except Exception as e:
+        log_error(
+            f"Error fetching receipt details for company '{company_name}': {str(e)}",
+            "NextPOS Company Lookup Error"
+        )
+        return {"name": company_name, "address": "", "tax_id": "", "phone": "", "email": ""}
+
+    frappe.cache().set_value(key, info, expires_in_sec=COMPANY_INFO_TTL)
+    return info
+
+
+def get_cached_customer_info(customer_name):
+    """Customer phone and tax ID for the receipt, cached in Redis per customer.
+
+    Failed lookups print blanks but are not cached, so a transient error
+    only affects the current receipt.
+    """
+    key = f"{CUSTOMER_INFO_CACHE_KEY}:{customer_name}"
+    info = frappe.cache().get_value(key)
+    if info is not None:
+        return info
+
+    try:
+        info = {
+            "phone": get_customer_phone(customer_name, raise_errors=True),
+            "tax_id": get_customer_tax_id(customer_name, raise_errors=True),
+        }
+    except Exception as e:
+        log_error(
+            f"Error fetching receipt details for customer '{customer_name}': {str(e)}",
+            "NextPOS Customer Lookup Error"
+        )
+        return {"phone": "", "tax_id": ""}
+
+    frappe.cache().set_value(key, info, expires_in_sec=CUSTOMER_INFO_TTL)
+    return info
+
+
+def clear_company_info_cache(doc=None, method=None):
+    """Doc event: drop cached company headers when a Company or Address changes."""
+    frappe.cache().delete_keys(f"{COMPANY_INFO_CACHE_KEY}:")
+
+
+def clear_customer_info_cache(doc=None, method=None):
+    """Doc event: drop one customer's cached info, or all of it when a Contact changes."""
+    if doc is not None and doc.doctype == "Customer":
+        frappe.cache().delete_value(f"{CUSTOMER_INFO_CACHE_KEY}:{doc.name}")
+    else:
+        frappe.cache().delete_keys(f"{CUSTOMER_INFO_CACHE_KEY}:")
+
+
+def get_customer_tax_id(customer_name, raise_errors=False):
     """Retrieve customer tax ID (NUIT).
     
-    Returns empty string if no tax ID found or on any error.
+    Returns empty string if no tax ID found or on any error, unless
+    raise_errors is set.
     """
     try:
         if not customer_name or not frappe.db.exists("Customer", customer_name):
@@ -139,14 +242,16 @@ def get_customer_tax_id(customer_name):
         tax_id = frappe.db.get_value("Customer", customer_name, "tax_id")
         return str(tax_id).strip() if tax_id else ""
     except Exception as e:
-        frappe.log_error(
+        if raise_errors:
+            raise
+        log_error(
             f"Error fetching tax ID for customer '{customer_name}': {str(e)}", 
             "NextPOS Tax ID Lookup Error"
         )
         return ""
 
 
-def get_customer_phone(customer_name):
+def get_customer_phone(customer_name, raise_errors=False):
     """Retrieve customer mobile phone number.
     
     Priority:
@@ -154,7 +259,8 @@ def get_customer_phone(customer_name):
     2. Customer's primary contact mobile
     3. Any linked contact with mobile number
     
-    Returns empty string if no phone found or on any error.
+    Returns empty string if no phone found or on any error, unless
+    raise_errors is set.
     """
     try:
         # Check if customer exists
@@ -200,8 +306,10 @@ def get_customer_phone(customer_name):
         return ""
         
     except Exception as e:
+        if raise_errors:
+            raise
         # Log error but don't break receipt printing
-        frappe.log_error(
+        log_error(
             f"Error fetching phone for customer '{customer_name}': {str(e)}", 
             "NextPOS Phone Lookup Error"
         )
@@ -266,55 +374,65 @@ def get_payment_lines(invoice):
         
     except Exception as e:
         # Log error but don't break receipt printing
-        frappe.log_error(
+        log_error(
             f"Error generating payment lines for invoice '{invoice.name}': {str(e)}", 
             "NextPOS Payment Display Error"
         )
         return lines
 
 
-def render_invoice(invoice_name: str):
-    """Render a POS Invoice into ESC/POS raw lines for thermal printers (80mm format)."""
-    invoice = frappe.get_doc("POS Invoice", invoice_name)
-    settings = frappe.get_single("NextPOS Settings")
-    width = int(settings.paper_width or DEFAULT_WIDTH)
+def get_receipt_layout(width, settings):
+    """Return the compiled layout for width, compiling it on first use.
 
-    lines = []
+    Tied to the settings' modified timestamp so a save invalidates every width.
+    """
+    version = str(settings.modified)
+    if _compiled_layouts["version"] != version:
+        _compiled_layouts["version"] = version
+        _compiled_layouts["layouts"] = {}
+
+    layouts = _compiled_layouts["layouts"]
+    layout = layouts.get(width)
+    if layout is None:
+        template_width = width if width in LAYOUT_TEMPLATES else DEFAULT_WIDTH
+        text_width = LAYOUT_TEMPLATES[template_width]["text_width"]
+        layout = compile_layout(
+            template_width,
+            {flag: settings.get(flag) for flag in LAYOUT_FLAGS},
+            format_custom_block(settings.receipt_footer, text_width),
+        )
+        layouts[width] = layout
+    return layout
 
-    # ========== HEADER SECTION ==========
-    company_info = get_company_info(invoice.company)
-    
-    # Company name (bold, truncated to 40 chars max)
-    company_name = company_info["name"][:40].strip()
-    lines.append("\x1BE\x01" + company_name + "\x1BE\x00")
-    
-    # Company address (truncated to 40 chars max)
-    if company_info["address"]:
-        company_address = company_info["address"][:40].strip()
-        lines.append(company_address)
-    
-    # Company tax ID (NUIT, truncated to 40 chars max)
-    if company_info["tax_id"]:
-        nuit_line = f"NUIT: {company_info['tax_id']}"[:40]
-        lines.append(nuit_line)
-    
-    lines.append(dashed_line(width))
 
-    # ========== CUSTOMER INFO SECTION ==========
-    customer_display = invoice.customer_name or invoice.customer
-    lines.append("\x1BE\x01Cliente:\x1BE\x00 " + customer_display)
-    
-    # Customer Phone Number
-    customer_phone = get_customer_phone(invoice.customer)
-    if customer_phone:
-        lines.append("\x1BE\x01Tel:\x1BE\x00 " + customer_phone)
-    
-    # Customer NUIT
-    customer_tax_id = get_customer_tax_id(invoice.customer)
-    if customer_tax_id:
-        lines.append("\x1BE\x01NUIT:\x1BE\x00 " + customer_tax_id)
-    
-    # Date and time (combine posting_date and posting_time)
+def load_receipt_context(invoice_name: str):
+    """Load everything the receipt needs from the database.
+
+    Kept separate from the line generator so that streamed rendering can
+    finish after the request's DB connection has been released.
+    """
+    invoice = frappe.get_doc("POS Invoice", invoice_name)
+    settings = frappe.get_cached_doc("NextPOS Settings")
+    printer_config = get_printer_for_pos(invoice.pos_profile)
+    width = int(printer_config.get("paper_width") or DEFAULT_WIDTH)
+    layout = get_receipt_layout(width, settings)
+    customer_info = get_cached_customer_info(invoice.customer)
+
+    return {
+        "invoice": invoice,
+        "settings": settings,
+        "layout": layout,
+        "company_info": get_cached_company_info(invoice.company),
+        "customer_phone": customer_info["phone"],
+        "customer_tax_id": customer_info["tax_id"],
+        "cashier": frappe.utils.get_fullname(invoice.owner) if layout["show_cashier"] else "",
+        "date_str": format_posting_datetime(invoice),
+        "payment_lines": get_payment_lines(invoice),
+    }
+
+
+def format_posting_datetime(invoice):
+    """Combine posting_date and posting_time into the receipt date string."""
     posting_time = invoice.posting_time
     if posting_time:
         # Convert timedelta to time object if needed
@@ -333,124 +451,175 @@ def render_invoice(invoice_name: str):
     
     posting_datetime = datetime.datetime.combine(invoice.posting_date, posting_time)
     date_str = frappe.utils.format_datetime(posting_datetime, "dd/MM/yyyy HH:mm")
-    lines.append("\x1BE\x01Data:\x1BE\x00 " + date_str)
-    
+    return date_str
+
+
+def iter_receipt_lines(context):
+    """Yield a receipt's ESC/POS lines one at a time, following its compiled layout."""
+    invoice = context["invoice"]
+    settings = context["settings"]
+    layout = context["layout"]
+    company_info = context["company_info"]
+    text_width = layout["text_width"]
+    dashed = layout["dashed"]
+
+    # ========== HEADER SECTION ==========
+    # Company name (bold, truncated to text width)
+    yield BOLD_ON + company_info["name"][:text_width].strip() + BOLD_OFF
+
+    # Company address
+    if layout["show_address"] and company_info["address"]:
+        yield company_info["address"][:text_width].strip()
+
+    # Company tax ID (NUIT)
+    if company_info["tax_id"]:
+        yield f"NUIT: {company_info['tax_id']}"[:text_width]
+
+    yield dashed
+
+    # ========== CUSTOMER INFO SECTION ==========
+    customer_display = invoice.customer_name or invoice.customer
+    yield BOLD_ON + "Cliente:" + BOLD_OFF + " " + customer_display
+
+    # Customer Phone Number
+    if context["customer_phone"]:
+        yield BOLD_ON + "Tel:" + BOLD_OFF + " " + context["customer_phone"]
+
+    # Customer NUIT
+    if context["customer_tax_id"]:
+        yield BOLD_ON + "NUIT:" + BOLD_OFF + " " + context["customer_tax_id"]
+
+    yield BOLD_ON + "Data:" + BOLD_OFF + " " + context["date_str"]
+
     # Invoice number
-    lines.append("\x1BE\x01Fatura No:\x1BE\x00 " + invoice.name)
-    
-    lines.append(dashed_line(width))
+    yield BOLD_ON + "Fatura No:" + BOLD_OFF + " " + invoice.name
+
+    if context["cashier"]:
+        yield BOLD_ON + "Operador:" + BOLD_OFF + " " + context["cashier"]
+
+    yield dashed
 
     # ========== ITEMS TABLE ==========
-    # Use safe width of 44 chars for table to prevent wrapping
-    safe_table_width = 44
-    col1_width = 26  # Description: ~59%
-    col2_width = 3   # Quantity: ~7%
-    col3_width = 13  # Value: ~33% (remaining)
-    
-    # Table header
-    header_row = format_table_row("Descricao", "Qtd", "Valor", safe_table_width, col1_width, col2_width)
-    lines.append("\x1BE\x01" + header_row + "\x1BE\x00")
-    
-    # Table rows
+    row_format = layout["row_format"]
+    desc_width = layout["desc_width"]
+    yield layout["table_header"]
+
     for item in invoice.items:
-        item_name = (item.item_name or item.item_code or "")[:col1_width]  # Truncate to column width
+        item_name = item.item_name or item.item_code or ""
         qty_str = f"{item.qty:.0f}"
         amount_str = format_amount(item.amount or 0)
-        
-        item_row = format_table_row(item_name, qty_str, amount_str, safe_table_width, col1_width, col2_width)
-        lines.append(item_row)
-    
-    lines.append(dashed_line(width))
+
+        if layout["wrap_long_names"] and len(item_name) > desc_width:
+            name_lines = textwrap.wrap(item_name, desc_width) or [item_name]
+            yield row_format.format(name_lines[0], qty_str, amount_str)
+            yield from name_lines[1:]
+        else:
+            yield row_format.format(item_name, qty_str, amount_str)
+
+    yield dashed
 
     # ========== TOTALS SECTION ==========
-    # Use safe width of 44 chars for totals to prevent wrapping
-    safe_totals_width = 44
-    
     # Sub-total (net total before taxes)
     subtotal = invoice.net_total or invoice.total
-    subtotal_str = format_amount(subtotal, include_currency=True)
-    label_width = safe_totals_width - len(subtotal_str)
-    if label_width > 0:
-        lines.append("Sub-total".ljust(label_width) + subtotal_str)
-    else:
-        lines.append("Sub-total " + subtotal_str)
-    
+    yield total_line(layout, "Sub-total", format_amount(subtotal, include_currency=True))
+
     # Taxes
-    if getattr(invoice, "taxes", []):
-        for tax in invoice.taxes:
-            tax_label = (tax.description or "Tax")[:15]  # Truncate tax name to 15 chars
-            tax_amount_str = format_amount(tax.tax_amount, include_currency=True)
-            label_width = safe_totals_width - len(tax_amount_str)
-            if label_width > 0:
-                lines.append(tax_label.ljust(label_width) + tax_amount_str)
-            else:
-                lines.append(tax_label + " " + tax_amount_str)
-    
+    if layout["show_tax"]:
+        tax_label_width = layout["tax_label_width"]
+        for tax in getattr(invoice, "taxes", None) or []:
+            tax_label = (tax.description or "Tax")[:tax_label_width]
+            yield total_line(layout, tax_label, format_amount(tax.tax_amount, include_currency=True))
+
     # Grand total (bold)
     total_str = format_amount(invoice.grand_total, include_currency=True)
-    label_width = safe_totals_width - len(total_str)
-    if label_width > 0:
-        lines.append("\x1BE\x01" + "TOTAL".ljust(label_width) + total_str + "\x1BE\x00")
-    else:
-        lines.append("\x1BE\x01TOTAL " + total_str + "\x1BE\x00")
-    
-    lines.append(dashed_line(width))
+    yield BOLD_ON + total_line(layout, "TOTAL", total_str) + BOLD_OFF
+
+    yield dashed
 
     # ========== PAYMENT SECTION ==========
-    payment_lines = get_payment_lines(invoice)
-    lines.extend(payment_lines)
-    
+    yield from context["payment_lines"]
+
     # Change due
     change = getattr(invoice, "change_amount", 0.00)
     if change > 0:
-        change_str = format_amount(change, include_currency=True)
-        lines.append("Troco: " + change_str)
-    
-    lines.append(dashed_line(width))
+        yield "Troco: " + format_amount(change, include_currency=True)
+
+    yield dashed
 
     # ========== FOOTER SECTION ==========
-    # "TOTAL A PAGAR" (bold, truncated to 40 chars)
-    total_label = "TOTAL A PAGAR"[:40]
-    lines.append("\x1BE\x01" + total_label + "\x1BE\x00")
-    
-    # Large total amount (double height, truncated to 40 chars)
-    large_total = format_amount(invoice.grand_total, include_currency=True)[:40].strip()
-    lines.append("\x1B!\x10" + large_total + "\x1B!\x00")
-    
-    lines.append(solid_line(width))
-    
-    # "Processado por Computador" (truncated to 40 chars to prevent wrap)
-    proc_text = "Processado por Computador"[:40]
-    lines.append(proc_text)
-    lines.append(dashed_line(width))
-    
+    yield layout["total_due_label"]
+
+    # Large total amount (double height)
+    yield DOUBLE_HEIGHT_ON + total_str[:text_width].strip() + DOUBLE_HEIGHT_OFF
+
+    yield layout["solid"]
+    yield layout["processed_by"]
+    yield dashed
+
     # QR Code placeholder (future enhancement)
     if getattr(settings, "enable_qr_code", False):
-        lines.append("[QR CODE]")
-        lines.append(dashed_line(width))
-    
-    # Company contact information (truncated to 40 chars)
-    contact_parts = []
-    if company_info["phone"]:
-        contact_parts.append(company_info["phone"])
-    if company_info["email"]:
-        contact_parts.append(company_info["email"])
-    
+        yield "[QR CODE]"
+        yield dashed
+
+    # Company contact information
+    contact_parts = [part for part in (company_info["phone"], company_info["email"]) if part]
     if contact_parts:
-        contact_line = " | ".join(contact_parts)
-        # Aggressively truncate to prevent wrapping
-        contact_line = contact_line[:40].strip()
-        lines.append(contact_line)
-    
-    # Custom footer (if configured)
-    if settings.receipt_footer:
-        lines.extend(format_custom_block(settings.receipt_footer, width))
-    
-    # Document status (truncated to 40 chars)
-    status_text = "**** FATURA FINAL ****" if invoice.docstatus == 1 else "**** FATURA RASCUNHO ****"
-    status_text = status_text[:40].strip()
-    lines.append(status_text)
-    
-    lines.append("\n\n")  # Feed before cut (reduced from 3 to 2 lines)
+        yield " | ".join(contact_parts)[:text_width].strip()
 
-    return [{"type": "raw", "data": "\n".join(lines)}]
+    # Custom footer (cleaned once when the layout was compiled)
+    yield from layout["footer_lines"]
+
+    # Document status
+    yield layout["status_final"] if invoice.docstatus == 1 else layout["status_draft"]
+
+    yield "\n\n"  # Feed before cut (reduced from 3 to 2 lines)
+
+
+def iter_receipt_chunks(lines, chunk_size=CHUNK_SIZE):
+    """Group receipt lines into QZ raw elements of roughly chunk_size chars.
+
+    Joining the chunks' data gives exactly the same text as one big
+    "\n".join(lines), so printers see an identical byte stream.
+    """
+    buffer = []
+    size = 0
+    first = True
+    for line in lines:
+        piece = line if first else "\n" + line
+        first = False
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield {"type": "raw", "data": "".join(buffer)}
+            buffer = []
+            size = 0
+    if buffer:
+        yield {"type": "raw", "data": "".join(buffer)}
+
+
+def render_invoice(invoice_name: str):
+    """Render a POS Invoice into ESC/POS raw lines for thermal printers (80mm format)."""
+    context = load_receipt_context(invoice_name)
+    data = "\n".join(iter_receipt_lines(context))
+
+    settings = context["settings"]
+    if not settings.get("disable_payload_optimizer"):
+        data, stats = optimize_escpos(data)
+        if settings.debug_raw:
+            frappe.logger("nextpos_printing").info(
+                f"{invoice_name}: ESC/POS payload {stats['bytes_in']} -> {stats['bytes_out']} bytes "
+                f"({stats['bytes_saved']} saved)"
+            )
+    return [{"type": "raw", "data": data}]
+
+
+def render_invoice_chunks(invoice_name: str, chunk_size=CHUNK_SIZE):
+    """Generator variant of render_invoice yielding bounded raw elements.
+
+    Used for long invoices so the full receipt text is never held in memory.
+    """
+    context = load_receipt_context(invoice_name)
+    chunks = iter_receipt_chunks(iter_receipt_lines(context), chunk_size)
+    if context["settings"].get("disable_payload_optimizer"):
+        return chunks
+    return optimize_chunks(chunks)
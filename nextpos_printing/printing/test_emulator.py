@@ -0,0 +1,131 @@
+import socket
+import time
+import unittest
+
+from nextpos_printing.printing.emulator import (
+    CUT_SECONDS,
+    DOTS_PER_MM,
+    LINE_HEIGHT_DOTS,
+    VirtualPrinter,
+    VirtualPrinterServer,
+    emulate_payload,
+)
+from nextpos_printing.printing.escpos import FULL_CUT, drawer_command, feed_lines
+
+
+class TestVirtualPrinter(unittest.TestCase):
+    def test_text_lines_and_feeds(self):
+        printer = VirtualPrinter(paper_width=48)
+        printer.feed("Line one\nLine two\n" + feed_lines(3))
+        report = printer.report()
+
+        self.assertEqual(report["lines"], 2)
+        self.assertEqual([text for text, _cols in printer.lines], ["Line one", "Line two"])
+        self.assertEqual(printer.feed_dots, 5 * LINE_HEIGHT_DOTS)
+        self.assertEqual(report["paper_mm"], round(5 * LINE_HEIGHT_DOTS / DOTS_PER_MM, 1))
+
+    def test_feed_after_pending_text_matches_line_feeds(self):
+        fed = VirtualPrinter()
+        fed.feed("Total" + feed_lines(3))
+        line_feeds = VirtualPrinter()
+        line_feeds.feed("Total\n\n\n")
+
+        self.assertEqual(fed.lines, [("Total", 5)])
+        self.assertEqual(fed.feed_dots, 3 * LINE_HEIGHT_DOTS)
+        self.assertEqual(fed.report()["paper_mm"], line_feeds.report()["paper_mm"])
+
+    def test_wrapped_lines_are_reported(self):
+        report = emulate_payload([{"type": "raw", "data": "x" * 43 + "\n" + "y" * 42 + "\n"}], paper_width=42)
+
+        self.assertEqual(report["max_columns"], 43)
+        self.assertEqual(len(report["wrapped_lines"]), 1)
+        self.assertEqual(report["wrapped_lines"][0]["line"], 1)
+
+    def test_double_width_counts_twice(self):
+        printer = VirtualPrinter(paper_width=48)
+        printer.feed("\x1b!\x20" + "W" * 25 + "\x1b!\x00\n")
+        printer.feed("\x1d!\x11" + "H" * 10 + "\x1d!\x00\n")
+
+        self.assertEqual([cols for _text, cols in printer.lines], [50, 20])
+        self.assertEqual(len(printer.report()["wrapped_lines"]), 1)
+
+    def test_utf8_characters_use_one_column(self):
+        printer = VirtualPrinter(paper_width=48)
+        printer.feed("Pão Açúcar\n")
+        self.assertEqual(printer.lines, [("Pão Açúcar", 10)])
+
+    def test_commands_split_across_chunks(self):
+        data = ("Total\n" + feed_lines(4) + FULL_CUT + drawer_command(1)).encode()
+        whole = VirtualPrinter()
+        whole.feed(data)
+
+        split = VirtualPrinter()
+        for byte in data:
+            split.feed(bytes([byte]))
+
+        self.assertEqual(split.report(), whole.report())
+        self.assertEqual(whole.cuts, 1)
+        self.assertEqual(whole.drawer_kicks, [{"pin": 1, "on_ms": 100, "off_ms": 100}])
+
+    def test_qr_and_raster_images(self):
+        store = "\x1d(k\x07\x00\x31\x50\x30ABCD"
+        print_qr = "\x1d(k\x03\x00\x31\x51\x30"
+        raster = "\x1dv0\x00\x02\x00\x03\x00" + "\xff" * 6
+        report = emulate_payload([{"type": "raw", "data": store + print_qr + raster}], encoding="latin-1")
+
+        self.assertEqual(report["qr_codes"], 1)
+        self.assertEqual(report["raster_dots"], 3)
+        self.assertEqual(report["unknown_commands"], [])
+
+    def test_unknown_commands_are_listed(self):
+        report = emulate_payload("\x1bZ")
+        self.assertEqual(report["unknown_commands"], ["ESC 0x5A"])
+
+    def test_cut_adds_mechanical_time(self):
+        report = emulate_payload("x\n" + FULL_CUT, speed_mm_s=1000)
+        self.assertEqual(report["cuts"], 1)
+        self.assertGreaterEqual(report["mechanical_seconds"], CUT_SECONDS)
+
+
+class TestVirtualPrinterServer(unittest.TestCase):
+    def setUp(self):
+        self.server = VirtualPrinterServer(("127.0.0.1", 0), paper_width=42, idle_timeout=0.2)
+        self.server.start_in_thread()
+        self.address = self.server.server_address
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def send_job(self, data):
+        with socket.create_connection(self.address, timeout=2) as sock:
+            sock.sendall(data)
+
+    def wait_for_jobs(self, count, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.server.stats()["jobs"] >= count:
+                return
+            time.sleep(0.02)
+        self.fail(f"expected {count} jobs, got {self.server.stats()['jobs']}")
+
+    def test_each_connection_is_one_job(self):
+        self.send_job(b"Receipt 1\n" + FULL_CUT.encode())
+        self.send_job(b"x" * 50 + b"\n")
+        self.wait_for_jobs(2)
+
+        stats = self.server.stats()
+        self.assertEqual(stats["bytes"], 13 + 51)
+        self.assertEqual(stats["wrapped_lines"], 1)
+        self.assertEqual(sorted(report["cuts"] for report in self.server.reports), [0, 1])
+
+    def test_idle_timeout_ends_job_on_open_connection(self):
+        with socket.create_connection(self.address, timeout=2) as sock:
+            sock.sendall(b"kept open\n")
+            self.wait_for_jobs(1)
+
+        self.assertEqual(self.server.reports[0]["lines"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
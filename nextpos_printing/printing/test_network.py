@@ -0,0 +1,87 @@
+import socket
+import time
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from nextpos_printing.printing import network
+from nextpos_printing.printing.emulator import VirtualPrinterServer
+from nextpos_printing.utils import printer_pool
+
+
+def closed_port_address():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{sock.getsockname()[1]}"
+
+
+class TestNetworkPrinting(unittest.TestCase):
+    def setUp(self):
+        self.server = VirtualPrinterServer(("127.0.0.1", 0), idle_timeout=0.2)
+        self.server.start_in_thread()
+        host, port = self.server.server_address
+        self.address = f"{host}:{port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wait_for_jobs(self, count, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline and self.server.stats()["jobs"] < count:
+            time.sleep(0.02)
+        return self.server.stats()["jobs"]
+
+    def test_parse_address(self):
+        self.assertEqual(network.parse_address("10.0.0.5"), ("10.0.0.5", 9100))
+        self.assertEqual(network.parse_address(" 10.0.0.5:9101 "), ("10.0.0.5", 9101))
+
+    def test_each_job_is_one_connection(self):
+        for n in range(2):
+            self.assertIsNone(network.send_to_printer(self.address, f"Receipt {n}\n".encode()))
+            # The listener only records a job once its connection is closed
+            self.assertEqual(self.wait_for_jobs(n + 1, timeout=1), n + 1)
+
+        self.assertEqual([report["lines"] for report in self.server.reports], [1, 1])
+
+    def test_refused_connection_is_reported(self):
+        with patch("time.sleep") as sleep:
+            error = network.send_to_printer(closed_port_address(), b"Receipt\n")
+
+        self.assertIsInstance(error, OSError)
+        # Retries sleep between attempts, not after the last one
+        self.assertEqual(sleep.call_count, network.MAX_RETRIES - 1)
+
+    def test_send_error_is_not_retried(self):
+        connection = network.PrinterConnection(*network.parse_address(self.address))
+        with patch.object(network.PrinterConnection, "send", side_effect=BrokenPipeError) as send:
+            error = network.send_with_retry(connection, b"Receipt\n")
+        connection.close()
+
+        self.assertIsInstance(error, BrokenPipeError)
+        self.assertEqual(send.call_count, 1)
+
+    def test_print_job_reports_to_printer_pool(self):
+        with patch.object(printer_pool, "release_printer") as release:
+            network.send_print_job(self.address, b"Receipt\n", "job1")
+        release.assert_called_once_with(self.address, "job1", ok=True)
+        self.assertEqual(self.wait_for_jobs(1), 1)
+
+        address = closed_port_address()
+        with patch.object(printer_pool, "release_printer") as release, patch("time.sleep"):
+            network.send_print_job(address, b"Receipt\n", "job2")
+        release.assert_called_once_with(address, "job2", ok=False)
+
+    def test_enqueue_uses_print_queue_when_it_has_a_worker(self):
+        for workers, queue in (({}, "short"), ({network.PRINT_QUEUE: {"timeout": 300}}, network.PRINT_QUEUE)):
+            with patch.dict(frappe.conf, {"workers": workers}), patch("frappe.enqueue") as enqueue:
+                network.enqueue_print_job(self.address, b"Receipt\n", "job1")
+
+            _method, kwargs = enqueue.call_args
+            self.assertEqual(kwargs["queue"], queue)
+            self.assertEqual((kwargs["address"], kwargs["data"], kwargs["job_id"]), (self.address, b"Receipt\n", "job1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+from nextpos_printing.printing.emulator import VirtualPrinter
+from nextpos_printing.printing.escpos import build_print_job
+from nextpos_printing.printing.layout import DOUBLE_HEIGHT_OFF, DOUBLE_HEIGHT_ON, compile_layout, total_line
+from nextpos_printing.printing.optimizer import EscPosOptimizer, optimize_chunks, optimize_escpos
+
+QR_CODE = "\x1d(k\x07\x00\x31\x50\x30ABCD" + "\x1d(k\x03\x00\x31\x51\x30"
+
+
+def sample_receipt(width=48, items=12):
+    """A receipt shaped like render_invoice output, built from the same layout."""
+    layout = compile_layout(width, {"show_tax": 1}, ["Obrigado pela preferencia", "Volte sempre"])
+    lines = ["\x1b@", "Empresa Lda".center(layout["text_width"]), layout["solid"], layout["table_header"]]
+    for n in range(items):
+        lines.append("\x1bE\x01" + f"Produto {n}" + "\x1bE\x00")
+        lines.append(layout["row_format"].format("", "2", f"{n * 10:.2f}"))
+    lines += [
+        layout["dashed"],
+        total_line(layout, "Subtotal", "1200.00"),
+        DOUBLE_HEIGHT_ON + total_line(layout, layout["total_due_label"], "1392.00") + DOUBLE_HEIGHT_OFF,
+        "",
+        "",
+        "",
+        "",
+        "",
+        QR_CODE,
+        *layout["footer_lines"],
+        "",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def printed(text, paper_width=48):
+    """What a printer makes of text: visible lines, paper length and mechanical actions."""
+    printer = VirtualPrinter(paper_width=paper_width)
+    printer.feed(text)
+    report = printer.report()
+    return {
+        "lines": [line.rstrip() for line, _columns in printer.lines if line.strip()],
+        "paper_mm": report["paper_mm"],
+        "max_columns": report["max_columns"],
+        "cuts": report["cuts"],
+        "drawer_kicks": report["drawer_kicks"],
+        "qr_codes": report["qr_codes"],
+    }
+
+
+class TestEscPosOptimizer(unittest.TestCase):
+    def test_prints_the_same_receipt_in_fewer_bytes(self):
+        for width in (42, 48, 80):
+            text = sample_receipt(width)
+            optimized, stats = optimize_escpos(text)
+
+            self.assertEqual(printed(optimized, width), printed(text, width))
+            self.assertGreater(stats["bytes_saved"], 0)
+            self.assertEqual(stats["bytes_in"] - stats["bytes_saved"], len(optimized.encode()))
+
+    def test_every_chunk_boundary(self):
+        text = sample_receipt(items=3)
+        expected, _stats = optimize_escpos(text)
+        for split in range(len(text) + 1):
+            chunks = [{"type": "raw", "data": text[:split]}, {"type": "raw", "data": text[split:]}]
+            optimized = "".join(chunk["data"] for chunk in optimize_chunks(chunks))
+            # Identical output means identical print, checked once above
+            self.assertEqual(optimized, expected, f"split at {split}")
+
+    def test_single_character_chunks(self):
+        text = sample_receipt()
+        chunks = [{"type": "raw", "data": ch} for ch in text]
+        optimized = "".join(chunk["data"] for chunk in optimize_chunks(chunks))
+        self.assertEqual(printed(optimized), printed(text))
+
+    def test_print_job_with_cut_copies_and_drawer(self):
+        config = {"cut_mode": "Partial Cut", "feed_before_cut": 5, "print_copies": 2,
+                  "open_cash_drawer": 1, "drawer_pin": 2}
+        job = build_print_job([{"type": "raw", "data": sample_receipt()}], config, open_drawer=True)
+        original = "".join(element["data"] for element in job)
+        optimized = "".join(element["data"] for element in optimize_chunks(job))
+
+        self.assertEqual(printed(optimized), printed(original))
+        self.assertEqual(printed(optimized)["cuts"], 2)
+
+    def test_is_idempotent(self):
+        optimized, _stats = optimize_escpos(sample_receipt())
+        self.assertEqual(optimize_escpos(optimized)[0], optimized)
+
+    def test_bold_toggles_across_lines_are_merged(self):
+        text = "\x1bE\x01A\x1bE\x00\n\x1bE\x01B\x1bE\x00\n"
+        # Bold off is only sent before the next visible character, or at the end
+        self.assertEqual(optimize_escpos(text)[0], "\x1bE\x01A\nB\n\x1bE\x00")
+
+    def test_trailing_spaces_are_dropped(self):
+        self.assertEqual(optimize_escpos("Total   \n  10.00  \n")[0], "Total\n  10.00\n")
+
+    def test_blank_line_runs_become_one_feed(self):
+        self.assertEqual(optimize_escpos("End" + "\n" * 6 + "\x1bd\x05")[0], "End\n\x1bd\x0a")
+        # Short runs are cheaper as plain line feeds
+        self.assertEqual(optimize_escpos("End\n\n\n")[0], "End\n\n\n")
+
+    def test_long_feed_runs_are_split(self):
+        optimized, _stats = optimize_escpos("x" + "\n" * 301)
+        self.assertEqual(optimized, "x\n\x1bd\x7f\x1bd\x7f\x1bd\x2e")
+        # Each feed count stays one byte once encoded as UTF-8
+        self.assertEqual(optimized.encode("utf-8"), optimized.encode("latin-1"))
+
+    def test_stats_accumulate_across_chunks(self):
+        optimizer = EscPosOptimizer()
+        output = optimizer.feed("A   \n") + optimizer.feed("B\n") + optimizer.finish()
+        self.assertEqual(output, "A\nB\n")
+        self.assertEqual(optimizer.stats(), {"bytes_in": 7, "bytes_out": 4, "bytes_saved": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
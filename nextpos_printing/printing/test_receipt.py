@@ -0,0 +1,205 @@
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import frappe
+
+from nextpos_printing.printing import receipt
+from nextpos_printing.printing.emulator import VirtualPrinter
+from nextpos_printing.printing.layout import LAYOUT_TEMPLATES, compile_layout
+from nextpos_printing.printing.receipt import iter_receipt_chunks, iter_receipt_lines, strip_escpos
+
+LINES = ["\x1b@", "\x1bE\x01Empresa Lda\x1bE\x00", ""] + [f"Produto {n}   2   {n * 10:.2f}" for n in range(300)]
+LONG_NAME = "Oleo alimentar de girassol refinado garrafa de cinco litros marca premium"
+COMPANY_INFO = {
+    "name": "Empresa de Teste Lda",
+    "address": "Av. 24 de Julho 100, Maputo",
+    "tax_id": "400123456",
+    "phone": "+258 84 000 0000",
+    "email": "loja@example.com",
+}
+
+
+def make_invoice(item_names, payments=None):
+    # Attribute access like a Document; a frappe._dict would shadow "items" with dict.items
+    return SimpleNamespace(
+        name="ACC-PSINV-TEST-0001",
+        company="Empresa de Teste Lda",
+        customer="Cliente Teste",
+        customer_name="Cliente Teste",
+        pos_profile="Loja 1",
+        owner="caixa@example.com",
+        posting_date=datetime.date(2025, 1, 2),
+        posting_time=datetime.timedelta(hours=9, minutes=5),
+        items=[SimpleNamespace(item_name=name, item_code="ITEM", qty=2, amount=1234.5) for name in item_names],
+        taxes=[SimpleNamespace(description="IVA 16%", tax_amount=197.52)],
+        net_total=1234.5 * len(item_names),
+        total=1234.5 * len(item_names),
+        grand_total=1432.02 * len(item_names),
+        change_amount=0,
+        payments=payments if payments is not None else [SimpleNamespace(mode_of_payment="Cash", amount=1432.02)],
+        docstatus=1,
+    )
+
+
+def render_lines(invoice, width=48, **flags):
+    """Run load_receipt_context and iter_receipt_lines with the documents they load patched in."""
+    settings = frappe._dict(modified=f"test-{width}-{sorted(flags.items())}", receipt_footer="Volte sempre", **flags)
+    with patch("frappe.get_doc", return_value=invoice), patch(
+        "frappe.get_cached_doc", return_value=settings
+    ), patch.object(receipt, "get_printer_for_pos", return_value={"paper_width": width}), patch.object(
+        receipt, "get_cached_company_info", return_value=COMPANY_INFO
+    ), patch.object(
+        receipt, "get_cached_customer_info", return_value={"phone": "", "tax_id": ""}
+    ), patch(
+        "frappe.utils.get_fullname", return_value="Ana Caixa"
+    ):
+        context = receipt.load_receipt_context(invoice.name)
+    return list(iter_receipt_lines(context))
+
+
+def print_lines(lines, width):
+    printer = VirtualPrinter(paper_width=width)
+    printer.feed("\n".join(lines))
+    return printer.report()
+
+
+class TestReceiptChunks(unittest.TestCase):
+    def test_chunks_join_back_to_the_full_text(self):
+        for chunk_size in (1, 7, 100, 16 * 1024):
+            chunks = list(iter_receipt_chunks(iter(LINES), chunk_size))
+            self.assertEqual("".join(chunk["data"] for chunk in chunks), "\n".join(LINES), chunk_size)
+
+    def test_chunks_are_bounded(self):
+        chunks = list(iter_receipt_chunks(iter(LINES), 100))
+        longest_line = max(len(line) for line in LINES) + 1
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk["data"]) < 100 + longest_line for chunk in chunks))
+
+    def test_empty_receipt(self):
+        self.assertEqual(list(iter_receipt_chunks(iter([]))), [])
+        self.assertEqual(list(iter_receipt_chunks(iter([""]))), [{"type": "raw", "data": ""}])
+
+
+class TestReceiptLayout(unittest.TestCase):
+    def test_row_widths_fit_each_paper_width(self):
+        for width, template in LAYOUT_TEMPLATES.items():
+            layout = compile_layout(width, {}, [])
+            row = layout["row_format"].format("x" * 100, "12", "1,234,567.89")
+
+            self.assertEqual(len(row), template["table_width"])
+            self.assertLess(template["table_width"], width)
+            self.assertEqual(len(strip_escpos(layout["table_header"])), template["table_width"])
+
+    def test_receipts_never_wrap(self):
+        for width in LAYOUT_TEMPLATES:
+            for wrap in (0, 1):
+                lines = render_lines(make_invoice([LONG_NAME, "Pao"]), width, wrap_long_names=wrap,
+                                     show_tax=1, show_cashier=1, show_address=1)
+                report = print_lines(lines, width)
+                self.assertEqual(report["wrapped_lines"], [], (width, wrap))
+
+    def test_wrap_long_names_adds_continuation_lines(self):
+        truncated = render_lines(make_invoice([LONG_NAME]), 48, wrap_long_names=0)
+        wrapped = render_lines(make_invoice([LONG_NAME]), 48, wrap_long_names=1)
+        desc_width = LAYOUT_TEMPLATES[48]["columns"][0]
+
+        self.assertEqual(len(wrapped) - len(truncated), 2)
+        first_row = next(line for line in wrapped if line.startswith("Oleo"))
+        self.assertTrue(first_row.rstrip().endswith("1,234.50"))
+        continuation = wrapped[wrapped.index(first_row) + 1:wrapped.index(first_row) + 3]
+        self.assertTrue(all(len(line) <= desc_width for line in continuation))
+        # Continuation lines carry the rest of the name, split on word boundaries
+        self.assertEqual(" ".join([first_row[:desc_width].strip()] + continuation), LONG_NAME)
+
+    def test_show_tax_toggle(self):
+        with_tax = render_lines(make_invoice(["Pao"]), show_tax=1)
+        without_tax = render_lines(make_invoice(["Pao"]), show_tax=0)
+
+        self.assertTrue(any(line.startswith("IVA 16%") for line in with_tax))
+        self.assertFalse(any("IVA" in line for line in without_tax))
+
+    def test_show_cashier_toggle(self):
+        with_cashier = render_lines(make_invoice(["Pao"]), show_cashier=1)
+        without_cashier = render_lines(make_invoice(["Pao"]), show_cashier=0)
+
+        self.assertIn("Operador: Ana Caixa", [strip_escpos(line) for line in with_cashier])
+        self.assertFalse(any("Operador" in line for line in without_cashier))
+
+    def test_show_address_keeps_company_contact(self):
+        contact = f"{COMPANY_INFO['phone']} | {COMPANY_INFO['email']}"
+        for show_address in (0, 1):
+            lines = render_lines(make_invoice(["Pao"]), show_address=show_address)
+            self.assertIn(contact, lines)
+            self.assertEqual(COMPANY_INFO["address"] in lines, bool(show_address))
+
+    def test_failing_payments_do_not_break_the_receipt(self):
+        class BrokenPayment:
+            mode_of_payment = "Cash"
+
+            @property
+            def amount(self):
+                raise ValueError("amount unavailable")
+
+        with patch.object(receipt, "log_error") as log_error:
+            lines = render_lines(make_invoice(["Pao"], payments=[BrokenPayment()]))
+
+        log_error.assert_called_once()
+        self.assertFalse(any("Pagamento" in line for line in lines))
+        self.assertTrue(any(line.startswith("Pao") for line in lines))
+
+
+class FakeCache:
+    """The parts of frappe.cache() the receipt caches use, backed by a dict."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, key):
+        return self.values.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self.values[key] = value
+
+    def delete_keys(self, prefix):
+        self.values = {key: value for key, value in self.values.items() if not key.startswith(prefix)}
+
+
+class TestCompanyInfoCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = FakeCache()
+        company = SimpleNamespace(name="Empresa", company_name="Empresa Lda", tax_id="400123456",
+                                  phone_no="84 000", email="loja@example.com")
+        self.lookups = [ConnectionError("database unavailable"), company, company]
+        patches = [
+            patch("frappe.cache", return_value=self.cache),
+            patch("frappe.get_cached_doc", side_effect=self.lookups),
+            patch("frappe.get_all", return_value=[]),
+            patch.object(receipt, "log_error"),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_failed_lookup_is_not_cached(self):
+        fallback = receipt.get_cached_company_info("Empresa")
+        self.assertEqual(fallback["name"], "Empresa")
+        self.assertEqual(fallback["tax_id"], "")
+        self.assertEqual(self.cache.values, {})
+        receipt.log_error.assert_called_once()
+
+        info = receipt.get_cached_company_info("Empresa")
+        self.assertEqual((info["name"], info["tax_id"]), ("Empresa Lda", "400123456"))
+        # Served from the cache from now on
+        self.assertEqual(receipt.get_cached_company_info("Empresa"), info)
+
+    def test_clear_drops_every_company(self):
+        self.lookups.pop(0)
+        receipt.get_cached_company_info("Empresa")
+        receipt.clear_company_info_cache()
+        self.assertEqual(self.cache.values, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,34 @@
 // nextpos_printing/public/js/nextpos_pos.js
 (function () {
+    const whenIdle = window.requestIdleCallback
+        ? (cb) => window.requestIdleCallback(cb, { timeout: 5000 })
+        : (cb) => setTimeout(cb, 1);
+
+    // --- QZ LIBRARY LOADER ---
+    // qz-tray is no longer injected with the page; it is fetched as a bundle on
+    // first print, or prefetched once the POS page is idle.
+    let qzLoader = null;
+
+    function loadQZ() {
+        if (window.qz) return Promise.resolve(window.qz);
+        if (!qzLoader) {
+            qzLoader = frappe.require("qz_tray.bundle.js")
+                .then(() => window.qz)
+                .catch(err => {
+                    qzLoader = null;
+                    throw err;
+                });
+        }
+        return qzLoader;
+    }
+
     // --- QZ CONNECTION HANDLING ---
     async function ensureQZ() {
+        try {
+            await loadQZ();
+        } catch (e) {
+            console.error("[NextPOS] Failed to load QZ Tray library:", e);
+        }
         if (!window.qz) {
             frappe.msgprint({
                 title: "QZ Tray Not Loaded",
@@ -33,12 +60,55 @@
     }
 
     // --- SETTINGS LOADER ---
+    // Settings are kept in memory and localStorage, tagged with the server's
+    // version. Revalidation sends the cached version and gets back only
+    // "not_modified" unless NextPOS Settings was saved since.
+    const SETTINGS_STORAGE_KEY = "npp_settings";
+    let settingsCache = null;
+
+    function readStoredSettings() {
+        try {
+            const stored = JSON.parse(localStorage.getItem(SETTINGS_STORAGE_KEY));
+            return stored && stored.version && stored.settings ? stored : null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    async function refreshNextPOSSettings() {
+        const cached = settingsCache || readStoredSettings();
+        const response = await frappe.call({
+            method: "nextpos_printing.api.settings.get_client_settings",
+            args: { version: cached ? cached.version : null }
+        });
+        const msg = response.message || {};
+
+        if (msg.not_modified && cached) {
+            settingsCache = cached;
+        } else {
+            settingsCache = { version: msg.version, settings: msg.settings };
+            try {
+                localStorage.setItem(SETTINGS_STORAGE_KEY, JSON.stringify(settingsCache));
+            } catch (e) {
+                // storage full or disabled, the in-memory copy is enough
+            }
+        }
+        return settingsCache.settings;
+    }
+
     async function loadNextPOSSettings() {
+        if (!settingsCache) settingsCache = readStoredSettings();
+
+        // Serve the cached copy straight away and revalidate in the background
+        if (settingsCache) {
+            refreshNextPOSSettings().catch(e =>
+                console.warn("[NextPOS] Settings revalidation failed, using cached copy:", e)
+            );
+            return settingsCache.settings;
+        }
+
         try {
-            const response = await frappe.call({
-                method: "nextpos_printing.api.settings.get_nextpos_settings"
-            });
-            return response.message;
+            return await refreshNextPOSSettings();
         } catch (e) {
             console.error("[NextPOS] Failed to load settings:", e);
             frappe.msgprint({
@@ -99,15 +169,91 @@
         });
     }
 
+    // --- PRINT LATENCY TELEMETRY ---
+    // Phase timings are queued in memory and beaconed in batches when the
+    // browser is idle or the page is hidden, so they never delay a print.
+    const TELEMETRY_BATCH_SIZE = 20;
+    const TELEMETRY_FLUSH_MS = 60000;
+    let telemetryQueue = [];
+    let telemetryTimer = null;
+
+    function getTerminalId() {
+        let id = localStorage.getItem("npp_terminal_id");
+        if (!id) {
+            id = (frappe.session && frappe.session.user || "terminal") + "-" +
+                Math.random().toString(36).slice(2, 10);
+            localStorage.setItem("npp_terminal_id", id);
+        }
+        return id;
+    }
+
+    function flushPrintTimings() {
+        if (telemetryTimer) {
+            clearTimeout(telemetryTimer);
+            telemetryTimer = null;
+        }
+        if (!telemetryQueue.length) return;
+
+        const batch = telemetryQueue.splice(0, telemetryQueue.length);
+        const body = new FormData();
+        body.append("samples", JSON.stringify(batch));
+        body.append("csrf_token", frappe.csrf_token || "");
+        const url = "/api/method/nextpos_printing.api.telemetry.report_print_timings";
+
+        if (navigator.sendBeacon && navigator.sendBeacon(url, body)) return;
+        fetch(url, { method: "POST", body, keepalive: true }).catch(() => {});
+    }
+
+    function scheduleTelemetryFlush() {
+        if (telemetryQueue.length >= TELEMETRY_BATCH_SIZE) {
+            whenIdle(flushPrintTimings);
+        } else if (!telemetryTimer) {
+            telemetryTimer = setTimeout(() => whenIdle(flushPrintTimings), TELEMETRY_FLUSH_MS);
+        }
+    }
+
+    function recordPrintTimings(printer, phases) {
+        const rounded = {};
+        Object.keys(phases).forEach(k => { rounded[k] = Math.round(phases[k]); });
+        telemetryQueue.push({ printer: printer || "", terminal: getTerminalId(), phases: rounded });
+        scheduleTelemetryFlush();
+    }
+
+    document.addEventListener("visibilitychange", () => {
+        if (document.visibilityState === "hidden") flushPrintTimings();
+    });
+
     // --- PRINT INVOICE ---
     window.printInvoiceWithQZ = async function (invoiceName, openDrawerFlag = false) {
-        await ensureQZ();
+        const phases = {};
+        const tStart = performance.now();
+        let tPhase = tStart;
 
         let posProfile = (cur_frm && cur_frm.doc && cur_frm.doc.pos_profile) || null;
 
+        // Network transport: the server renders and sends the job itself
+        const settings = settingsCache ? settingsCache.settings : await loadNextPOSSettings();
+        if (posProfile && settings && (settings.network_profiles || []).includes(posProfile)) {
+            const r = await frappe.call({
+                method: "nextpos_printing.api.print.print_network",
+                args: { pos_invoice_name: invoiceName, open_drawer: openDrawerFlag ? 1 : 0 }
+            });
+            console.log("[nextpos_printing] Network print queued:", r.message);
+            return;
+        }
+
+        // Fetch the QZ bundle first so "connect" only times the QZ Tray websocket
+        await loadQZ().catch(() => {});
+        tPhase = performance.now();
+        await ensureQZ();
+        phases.connect = performance.now() - tPhase;
+
+        let printers = await qz.printers.find();
+
+        // The server picks the healthiest, least busy printer of the profile's pool
         let res = await frappe.call({
-            method: "nextpos_printing.api.settings.get_printer_for_pos",
-            args: { pos_profile: posProfile }
+            method: "nextpos_printing.api.print.acquire_printer",
+            args: { pos_profile: posProfile, available: JSON.stringify(printers) }
         });
 
         if (!res || !res.message) {
@@ -115,63 +261,94 @@
             return;
         }
 
-        let { printer, cut_mode, feed_before_cut, print_copies, open_cash_drawer, drawer_pin } = res.message;
+        let { printer, job_id, cut_mode, feed_before_cut, print_copies, open_cash_drawer, drawer_pin } = res.message;
+        const acquiredPrinter = printer;
+        let printOk = true;
 
-        let printers = await qz.printers.find();
         if (!printers.includes(printer)) {
             frappe.msgprint(`Configured printer "${printer}" not found. Using first available printer.`);
             printer = printers[0];
         }
 
-        const resp = await fetch(
-            `/api/method/nextpos_printing.api.print.get_print_payload?pos_invoice_name=${invoiceName}`
-        ).then(r => r.json());
-
-        let data = resp.message;
-        if (!Array.isArray(data)) data = [data];
-
-        // Add cut commands if configured
-        if (cut_mode && cut_mode !== "None") {
-            let cutData = "";
+        try {
+            tPhase = performance.now();
+            const resp = await fetch(
+                `/api/method/nextpos_printing.api.print.get_print_payload?pos_invoice_name=${invoiceName}`
+            ).then(r => r.json());
+            phases.payload = performance.now() - tPhase;
+
+            let data = resp.message;
+            if (!Array.isArray(data)) data = [data];
+
+            // Add cut commands if configured
+            if (cut_mode && cut_mode !== "None") {
+                let cutData = "";
+
+                if (feed_before_cut && parseInt(feed_before_cut) > 0) {
+                    const n = parseInt(feed_before_cut);
+                    cutData += "\x1Bd" + String.fromCharCode(n);
+                }
 
-            if (feed_before_cut && parseInt(feed_before_cut) > 0) {
-                const n = parseInt(feed_before_cut);
-                cutData += "\x1Bd" + String.fromCharCode(n);
-            }
+                if (cut_mode === "Full Cut") {
+                    cutData += "\x1DV\x00";
+                } else if (cut_mode === "Partial Cut") {
+                    cutData += "\x1DV\x01";
+                }
 
-            if (cut_mode === "Full Cut") {
-                cutData += "\x1DV\x00";
-            } else if (cut_mode === "Partial Cut") {
-                cutData += "\x1DV\x01";
+                data.push({ type: "raw", data: cutData });
             }
 
-            data.push({ type: "raw", data: cutData });
-        }
-
-        const cfg = qz.configs.create(printer);
-        let copies = parseInt(print_copies) || 1;
+            const cfg = qz.configs.create(printer);
+            let copies = parseInt(print_copies) || 1;
 
-        for (let i = 0; i < copies; i++) {
-            await qz.print(cfg, data)
-                .then(() => console.log(`Printed copy ${i + 1}/${copies} to ${printer}`))
-                .catch(err => console.error("Print failed", err));
+            tPhase = performance.now();
+            for (let i = 0; i < copies; i++) {
+                await qz.print(cfg, data)
+                    .then(() => console.log(`Printed copy ${i + 1}/${copies} to ${printer}`))
+                    .catch(err => {
+                        printOk = false;
+                        console.error("Print failed", err);
+                    });
+            }
+            phases.print = performance.now() - tPhase;
+
+            // Auto open drawer if enabled
+            if (openDrawerFlag && open_cash_drawer) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                let pin = parseInt(drawer_pin);
+                if (isNaN(pin)) pin = 0;
+                let drawerCommand = {
+                    type: "raw",
+                    format: "hex",
+                    data: "1B70" + pin.toString(16).padStart(2, "0") + "3232"
+                };
+                console.log("[nextpos_printing] Drawer command fired:", drawerCommand.data);
+                tPhase = performance.now();
+                await qz.print(cfg, [drawerCommand])
+                    .then(() => console.log("Drawer opened after print"))
+                    .catch(err => console.error("Drawer open failed", err));
+                phases.drawer = performance.now() - tPhase;
+            }
+        } catch (err) {
+            printOk = false;
+            throw err;
+        } finally {
+            if (job_id) {
+                frappe.call({
+                    method: "nextpos_printing.api.print.release_printer",
+                    args: {
+                        printer: acquiredPrinter,
+                        job_id,
+                        ok: printOk ? 1 : 0,
+                        // A job sent to a fallback printer says nothing about the acquired one
+                        used: printer === acquiredPrinter ? 1 : 0
+                    }
+                });
+            }
         }
 
-        // Auto open drawer if enabled
-        if (openDrawerFlag && open_cash_drawer) {
-            await new Promise(resolve => setTimeout(resolve, 1000));
-            let pin = parseInt(drawer_pin);
-            if (isNaN(pin)) pin = 0;
-            let drawerCommand = {
-                type: "raw",
-                format: "hex",
-                data: "1B70" + pin.toString(16).padStart(2, "0") + "3232"
-            };
-            console.log("[nextpos_printing] Drawer command fired:", drawerCommand.data);
-            await qz.print(cfg, [drawerCommand])
-                .then(() => console.log("Drawer opened after print"))
-                .catch(err => console.error("Drawer open failed", err));
-        }
+        phases.total = performance.now() - tStart;
+        recordPrintTimings(printer, phases);
     };
 
     // POS sidebar drawer → use mapped printer (production use)
@@ -299,30 +476,65 @@
     }
 
     // --- Observe for dynamic UI elements ---
+    // Observers are scoped to the POS page, not document.body, and the summary
+    // watcher is disconnected whenever the user leaves the POS route.
+    let summaryObserver = null;
+    let summaryCheckQueued = false;
+
+    function get_pos_root() {
+        return document.getElementById("page-point-of-sale");
+    }
+
     function watch_summary_btns() {
-        const mo = new MutationObserver(() => replace_print_receipt_button());
-        mo.observe(document.body, { childList: true, subtree: true });
+        const root = document.querySelector("#page-point-of-sale .point-of-sale-app");
+        if (!root || summaryObserver) return;
+
+        // Collapse bursts of mutations into a single check per frame
+        summaryObserver = new MutationObserver(() => {
+            if (summaryCheckQueued) return;
+            summaryCheckQueued = true;
+            requestAnimationFrame(() => {
+                summaryCheckQueued = false;
+                replace_print_receipt_button();
+            });
+        });
+        summaryObserver.observe(root, { childList: true, subtree: true });
+        replace_print_receipt_button();
+    }
+
+    function stop_watching_summary_btns() {
+        if (summaryObserver) {
+            summaryObserver.disconnect();
+            summaryObserver = null;
+        }
+    }
+
+    function mount() {
+        add_sidebar_buttons();
+        watch_summary_btns();
     }
 
     function wait_for_toolbar_then_mount() {
+        if (document.querySelector("#page-point-of-sale .point-of-sale-app")) {
+            mount();
+            return;
+        }
+
         const mo = new MutationObserver((_m, obs) => {
-            if (document.querySelector(".summary-btns")) {
-                replace_print_receipt_button();
-            }
             if (document.querySelector("#page-point-of-sale .point-of-sale-app")) {
                 obs.disconnect();
-                add_sidebar_buttons();
-                return;
+                mount();
             }
         });
-        mo.observe(document.body, { childList: true, subtree: true });
+        mo.observe(get_pos_root() || document.body, { childList: true, subtree: true });
         setTimeout(() => mo.disconnect(), 5000);
     }
 
     // --- Auto-print after POS Invoice save ---
     async function autoPrintIfEnabled(invoice) {
         try {
-            const settings = await loadNextPOSSettings();
+            // Use the cached copy; it is revalidated on every POS route change
+            const settings = settingsCache ? settingsCache.settings : await loadNextPOSSettings();
 
             if (settings && settings.enable_auto_print) {
                 console.log("[nextpos_printing] Auto-print enabled, sending invoice", invoice.name);
@@ -334,15 +546,24 @@
     }
 
     // --- POS route hooks ---
-    async function on_pos_route() {
+    let posInvoiceHooked = false;
+
+    function on_pos_route() {
         const route = frappe.get_route_str && frappe.get_route_str();
-        if (route === "point-of-sale") {
-            // Ensure settings exist on POS load
-            await loadNextPOSSettings();
+        if (route !== "point-of-sale") {
+            stop_watching_summary_btns();
+            return;
+        }
+
+        // Settings come from the local cache and revalidate in the background
+        loadNextPOSSettings().catch(() => {});
 
-            setTimeout(wait_for_toolbar_then_mount, 300);
-            setTimeout(watch_summary_btns, 300);
+        setTimeout(wait_for_toolbar_then_mount, 300);
+        whenIdle(() => loadQZ().catch(() => {}));
 
+        // Register once; re-registering on every route change stacked handlers
+        if (!posInvoiceHooked) {
+            posInvoiceHooked = true;
             frappe.ui.form.on("POS Invoice", {
                 after_save: function (frm) {
                     if (frm.doc.docstatus === 1) {
@@ -686,8 +686,9 @@ var qz = (function() {
                     a.href = loc;
                     return a.href;
                 } else if (typeof exports === 'object') {
-                    //node.js
-                    require('path').resolve(loc);
+                    //node.js (indirect call so the browser bundle doesn't try to resolve 'path')
+                    var nodeRequire = require;
+                    nodeRequire('path').resolve(loc);
                 }
                 return loc;
             },
@@ -0,0 +1,6 @@
+// nextpos_printing/public/js/qz_tray.bundle.js
+// Built (and minified in production) by `bench build`; the POS page loads it
+// on demand with frappe.require("qz_tray.bundle.js") instead of on page load.
+import qz from "./qz-tray.js";
+
+window.qz = qz;
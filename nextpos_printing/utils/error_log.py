@@ -0,0 +1,96 @@
+"""
+Aggregated error logging for the receipt hot path.
+Errors are deduplicated by signature and counted in Redis; a scheduler job
+writes one summarised Error Log per signature, so rendering never inserts
+documents synchronously.
+"""
+import hashlib
+import json
+import re
+
+import frappe
+from frappe.utils import now
+
+ERROR_COUNTS_KEY = "nextpos_error_counts"  # signature -> occurrences (HINCRBY)
+ERROR_DETAILS_KEY = "nextpos_error_details"  # signature -> title, sample, first_seen
+ERROR_LAST_SEEN_KEY = "nextpos_error_last_seen"  # signature -> timestamp
+MAX_SAMPLE_LENGTH = 1000
+
+
+def get_signature(title, message):
+    """Group errors that differ only in quoted values or numbers (customer names, ids)."""
+    normalized = re.sub(r"'[^']*'", "'?'", message)
+    normalized = re.sub(r"\d+", "N", normalized)
+    return hashlib.md5(f"{title}|{normalized}".encode()).hexdigest()[:16]
+
+
+def _keys(suffix=""):
+    cache = frappe.cache()
+    return [cache.make_key(key + suffix) for key in (ERROR_COUNTS_KEY, ERROR_DETAILS_KEY, ERROR_LAST_SEEN_KEY)]
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def log_error(message, title):
+    """Record an error for the next flush instead of inserting an Error Log now.
+
+    Uses atomic Redis hash commands so concurrent workers never lose counts.
+    """
+    try:
+        signature = get_signature(title, message)
+        timestamp = now()
+        counts_key, details_key, last_seen_key = _keys()
+        details = {"title": title, "sample": message[:MAX_SAMPLE_LENGTH], "first_seen": timestamp}
+
+        pipe = frappe.cache().pipeline()
+        pipe.hincrby(counts_key, signature, 1)
+        pipe.hsetnx(details_key, signature, json.dumps(details))
+        pipe.hset(last_seen_key, signature, timestamp)
+        pipe.execute()
+    except Exception:
+        pass  # logging must never break receipt printing
+
+
+def flush_error_log():
+    """Scheduler job: write one Error Log per buffered signature and reset the counts.
+
+    The buffers are renamed away in one transaction before being read, so
+    errors recorded during the flush go to fresh keys for the next run.
+    """
+    cache = frappe.cache()
+    keys = _keys()
+    # Raw pipeline commands: RedisWrapper.exists() and hgetall() would prefix the keys again
+    if not cache.pipeline().exists(keys[0]).execute()[0]:
+        return
+
+    flushing = _keys(f":flushing:{frappe.generate_hash(length=8)}")
+    pipe = cache.pipeline()
+    for key, target in zip(keys, flushing):
+        pipe.rename(key, target)
+    try:
+        pipe.execute()
+    except Exception:
+        # Another flush took the buffers first
+        cache.delete(*flushing)
+        return
+
+    pipe = cache.pipeline()
+    for key in flushing:
+        pipe.hgetall(key)
+    pipe.delete(*flushing)
+    counts, details, last_seen = (
+        {_decode(field): _decode(value) for field, value in buffer.items()} for buffer in pipe.execute()[:3]
+    )
+
+    for signature, count in counts.items():
+        entry = json.loads(details.get(signature) or "{}")
+        frappe.log_error(
+            title=f"{entry.get('title', 'NextPOS Error')} (x{count})",
+            message=(
+                f"{count} occurrence(s) between {entry.get('first_seen')} "
+                f"and {last_seen.get(signature)}.\n\nSample:\n{entry.get('sample', '')}"
+            ),
+        )
+    frappe.db.commit()
@@ -0,0 +1,157 @@
+"""
+Printer pool scheduling for NextPOS Printing.
+Tracks in-flight jobs and recent failures per printer in Redis (shared by
+every terminal and worker) and routes each job to the healthiest,
+least-loaded printer of the POS Profile's pool.
+
+Every update is a single Redis command or a MULTI pipeline on raw keys
+(not RedisWrapper's pickled, locally cached values), so concurrent
+terminals never overwrite each other's state.
+"""
+import time
+
+import frappe
+
+POOL_KEY_PREFIX = "nextpos_printer_pool"
+JOB_TIMEOUT = 120  # seconds before an unreleased job stops counting as in flight
+BACKOFF_BASE = 5  # seconds of backoff after the first failure, doubled per failure
+BACKOFF_MAX = 300
+ROUTING_LOCK_TIMEOUT = 5  # seconds; routing holds the lock for a few Redis round trips
+
+
+def _key(kind, printer=None):
+    name = f"{POOL_KEY_PREFIX}:{kind}" if printer is None else f"{POOL_KEY_PREFIX}:{kind}:{printer}"
+    return frappe.cache().make_key(name)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def get_backoff(failures):
+    return min(BACKOFF_BASE * 2 ** (failures - 1), BACKOFF_MAX)
+
+
+def get_printer_state(printer):
+    now = time.time()
+    jobs_key = _key("jobs", printer)
+    pipe = frappe.cache().pipeline()
+    # Drop jobs whose terminal never released them (tab closed, crash)
+    pipe.zremrangebyscore(jobs_key, "-inf", now - JOB_TIMEOUT)
+    pipe.zrange(jobs_key, 0, -1, withscores=True)
+    pipe.hgetall(_key("health", printer))
+    pipe.get(_key("probe", printer))
+    _expired, jobs, health, probing = pipe.execute()
+
+    jobs = {_decode(job): started for job, started in jobs}
+    health = {_decode(field): _decode(value) for field, value in health.items()}
+    failures = int(health.get("failures") or 0)
+    probing = _decode(probing)
+    return {
+        "jobs": jobs,
+        "failures": failures,
+        "retry_at": float(health.get("failed_at") or 0) + get_backoff(failures) if failures else 0,
+        # A probe whose job expired was abandoned and must not block the printer
+        "probing": probing if probing in jobs else None,
+    }
+
+
+def is_available(state, now):
+    """A printer is usable if it is healthy, or its backoff expired and no probe is running."""
+    if not state["failures"]:
+        return True
+    return now >= state["retry_at"] and not state["probing"]
+
+
+def choose_printer(printers):
+    """Pick the best printer from an ordered pool.
+
+    Healthy printers beat ones in backoff, then fewer in-flight jobs, then
+    fewer recent failures, then pool order. Returns (printer, state).
+    """
+    now = time.time()
+    best = None
+    for position, printer in enumerate(printers):
+        state = get_printer_state(printer)
+        rank = (
+            0 if is_available(state, now) else 1,
+            len(state["jobs"]),
+            state["failures"],
+            position,
+        )
+        if best is None or rank < best[0]:
+            best = (rank, printer, state)
+    return best[1], best[2]
+
+
+def acquire_printer(printers):
+    """Route a job to a printer from the pool and register it as in flight.
+
+    Returns (printer, job_id), or (None, None) for an empty pool. If the
+    chosen printer is recovering from failures, this job doubles as its
+    health probe.
+    """
+    if not printers:
+        return None, None
+
+    cache = frappe.cache()
+    job_id = frappe.generate_hash(length=10)
+    # Choosing and registering must not interleave, or concurrent terminals
+    # all see the same "least busy" printer
+    with cache.lock(_key("routing"), timeout=ROUTING_LOCK_TIMEOUT, blocking_timeout=ROUTING_LOCK_TIMEOUT):
+        printer, state = choose_printer(printers)
+        now = time.time()
+        pipe = cache.pipeline()
+        pipe.zadd(_key("jobs", printer), {job_id: now})
+        pipe.expire(_key("jobs", printer), JOB_TIMEOUT)
+        if state["failures"] and now >= state["retry_at"] and not state["probing"]:
+            pipe.set(_key("probe", printer), job_id, ex=JOB_TIMEOUT)
+        pipe.execute()
+    return printer, job_id
+
+
+def release_printer(printer, job_id, ok=True):
+    """Finish a job.
+
+    ok=True resets the printer's health and ok=False backs it off. ok=None
+    means the job never reached this printer (the terminal printed
+    elsewhere), so its health is left as it was.
+    """
+    if not printer or not job_id:
+        return
+
+    cache = frappe.cache()
+    probe_key = _key("probe", printer)
+    pipe = cache.pipeline()
+    pipe.zrem(_key("jobs", printer), job_id)
+    pipe.get(probe_key)
+    _removed, probing = pipe.execute()
+    if _decode(probing) == job_id:
+        cache.delete(probe_key)
+
+    if ok is None:
+        return
+
+    health_key = _key("health", printer)
+    pipe = cache.pipeline()
+    if ok:
+        pipe.delete(health_key)
+    else:
+        pipe.hincrby(health_key, "failures", 1)
+        pipe.hset(health_key, "failed_at", time.time())
+    pipe.execute()
+
+
+def get_pool_status(printers):
+    """Return a summary of each printer's health for diagnostics."""
+    now = time.time()
+    return [
+        {
+            "printer": printer,
+            "in_flight": len(state["jobs"]),
+            "failures": state["failures"],
+            "healthy": not state["failures"],
+            "retry_in": max(0, round(state["retry_at"] - now)),
+        }
+        for printer, state in ((p, get_printer_state(p)) for p in printers)
+    ]
@@ -1,36 +1,127 @@
+"""
+Resolved NextPOS Settings for the print path.
+Printer configs per POS Profile and the slim client settings are built
+from the settings document once and served from Redis until the next save.
+"""
 import frappe
+from frappe.utils import cint
 
+PRINTER_CONFIG_CACHE_KEY = "nextpos_printer_config"
+CLIENT_SETTINGS_CACHE_KEY = "nextpos_client_settings"
+DEFAULT_PROFILE_KEY = "__default__"
 
-def get_printer_for_pos(pos_profile=None):
-    """Return printer mapping for a given POS Profile,
-    with fallback to default printer and global cut mode."""
-    settings = get_nextpos_settings()
-
-    # Default values
-    printer = settings.default_printer
-    cut_mode = settings.cut_mode or "Full Cut"
-    feed_before_cut = settings.feed_before_cut or 5
-    print_copies = settings.print_copies or 1
-    drawer_pin = settings.drawer_pin
-    open_cash_drawer = bool(settings.open_cash_drawer)
-
-    # Try to find a specific mapping for this POS Profile
-    if hasattr(settings, "printer_mappings"):
-        for row in settings.printer_mappings:
-            if row.pos_profile == pos_profile:
-                printer = row.printer
-                break
+# Fields the POS page actually reads; header/footer HTML and mappings stay server side
+CLIENT_SETTINGS_FIELDS = (
+    "enable_auto_print",
+    "default_printer",
+    "paper_width",
+    "print_copies",
+    "cut_mode",
+    "feed_before_cut",
+    "open_cash_drawer",
+    "drawer_pin",
+    "debug_raw",
+)
+
+
+def build_printer_configs(settings=None):
+    """Merge global defaults with each printer mapping's overrides.
+
+    Returns a dict keyed by POS Profile (plus DEFAULT_PROFILE_KEY for the
+    fallback), each value being the complete printer config for that profile.
+    """
+    settings = settings or get_nextpos_settings()
+
+    default = {
+        "printer": settings.default_printer,
+        "cut_mode": settings.cut_mode or "Full Cut",
+        "feed_before_cut": cint(settings.feed_before_cut) or 5,
+        "print_copies": cint(settings.print_copies) or 1,
+        "drawer_pin": settings.drawer_pin,
+        "open_cash_drawer": bool(settings.open_cash_drawer),
+        "paper_width": cint(settings.paper_width) or 48,
+        "printers": [settings.default_printer] if settings.default_printer else [],
+        "transport": "QZ Tray",
+    }
+    configs = {DEFAULT_PROFILE_KEY: default}
+
+    for row in settings.get("printer_mappings") or []:
+        # First mapping wins, same as the old linear lookup
+        if not row.pos_profile or row.pos_profile in configs:
+            continue
+
+        config = dict(default)
+        config["printer"] = row.printer or default["printer"]
+        config["printers"] = get_pool_printers(config["printer"], row.get("printer_pool"))
+        config["transport"] = row.get("transport") or "QZ Tray"
+        if row.get("cut_mode"):
+            config["cut_mode"] = row.cut_mode
+        if cint(row.get("feed_before_cut")) > 0:
+            config["feed_before_cut"] = cint(row.feed_before_cut)
+        if cint(row.get("print_copies")) > 0:
+            config["print_copies"] = cint(row.print_copies)
+        if row.get("drawer_pin") not in (None, ""):
+            config["drawer_pin"] = cint(row.drawer_pin)
+        if cint(row.get("paper_width")) > 0:
+            config["paper_width"] = cint(row.paper_width)
+        configs[row.pos_profile] = config
+
+    return configs
+
+
+def get_pool_printers(printer, printer_pool=None):
+    """Return the mapping's primary printer followed by its pool, without duplicates."""
+    printers = [printer] if printer else []
+    for line in (printer_pool or "").splitlines():
+        name = line.strip()
+        if name and name not in printers:
+            printers.append(name)
+    return printers
 
+
+def get_printer_configs():
+    """Return the resolved per-profile configs, building them on a cache miss."""
+    return frappe.cache().get_value(PRINTER_CONFIG_CACHE_KEY, generator=build_printer_configs)
+
+
+def build_client_settings(settings=None):
+    """Return the slim, versioned settings shape sent to the POS page.
+
+    The version is the document's modified timestamp, so it changes on
+    every save and survives cache flushes unchanged.
+    """
+    settings = settings or get_nextpos_settings()
+    client_settings = {field: settings.get(field) for field in CLIENT_SETTINGS_FIELDS}
+    # POS Profiles whose jobs the server sends itself instead of QZ Tray
+    client_settings["network_profiles"] = [
+        row.pos_profile for row in settings.get("printer_mappings") or [] if row.get("transport") == "Network"
+    ]
     return {
-        "printer": printer,
-        "cut_mode": cut_mode,
-        "feed_before_cut": feed_before_cut,
-        "print_copies": print_copies,
-        "drawer_pin": drawer_pin,
-        "open_cash_drawer": open_cash_drawer,
+        "version": str(settings.modified),
+        "settings": client_settings,
     }
 
 
+def get_client_settings(version=None):
+    """Return the client settings, or just the version if the caller is current."""
+    client_settings = frappe.cache().get_value(CLIENT_SETTINGS_CACHE_KEY, generator=build_client_settings)
+    if version and version == client_settings["version"]:
+        return {"version": version, "not_modified": True}
+    return client_settings
+
+
+def clear_settings_cache():
+    """Drop every cache derived from NextPOS Settings; the next read rebuilds it."""
+    frappe.cache().delete_value([PRINTER_CONFIG_CACHE_KEY, CLIENT_SETTINGS_CACHE_KEY])
+
+
+def get_printer_for_pos(pos_profile=None):
+    """Return printer mapping for a given POS Profile,
+    with fallback to default printer and global settings."""
+    configs = get_printer_configs()
+    return configs.get(pos_profile) or configs[DEFAULT_PROFILE_KEY]
+
+
 def get_nextpos_settings():
     """Return the single NextPOS Settings document."""
     return frappe.get_single("NextPOS Settings")
@@ -0,0 +1,109 @@
+"""
+Print-latency telemetry for NextPOS Printing.
+Terminals post batched phase timings; they are queued in Redis and folded
+into rolling percentiles per printer and per terminal by a scheduler job.
+"""
+import json
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+TELEMETRY_QUEUE_KEY = "nextpos_print_timings"
+PHASES = ("payload", "connect", "print", "drawer", "total")
+WINDOW_SIZE = 200  # samples kept per printer/terminal/phase
+MAX_QUEUE = 50000  # drop oldest samples if the scheduler falls behind
+MAX_BATCH = 100  # samples accepted per beacon
+
+
+def queue_samples(samples):
+    """Validate a beacon batch and push it onto the Redis queue.
+
+    Kept cheap on purpose: no DB access, the scheduler does the aggregation.
+    """
+    if isinstance(samples, str):
+        samples = json.loads(samples or "[]")
+
+    cache = frappe.cache()
+    queued = 0
+    for sample in (samples or [])[:MAX_BATCH]:
+        if not isinstance(sample, dict):
+            continue
+        phases = {
+            phase: cint(ms)
+            for phase, ms in (sample.get("phases") or {}).items()
+            if phase in PHASES and cint(ms) >= 0
+        }
+        if not phases:
+            continue
+        entry = {
+            "printer": str(sample.get("printer") or "")[:140],
+            "terminal": str(sample.get("terminal") or "")[:140],
+            "phases": phases,
+        }
+        cache.rpush(TELEMETRY_QUEUE_KEY, json.dumps(entry))
+        queued += 1
+
+    if queued:
+        cache.ltrim(TELEMETRY_QUEUE_KEY, -MAX_QUEUE, -1)
+    return queued
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def aggregate_queued_samples():
+    """Drain the Redis queue and update the rolling latency rows."""
+    cache = frappe.cache()
+    raw = cache.lrange(TELEMETRY_QUEUE_KEY, 0, -1) or []
+    if not raw:
+        return
+    cache.ltrim(TELEMETRY_QUEUE_KEY, len(raw), -1)
+
+    # Group samples by (scope, key, phase) so every row is written once
+    grouped = {}
+    for item in raw:
+        try:
+            entry = json.loads(item)
+        except ValueError:
+            continue
+        for phase, ms in entry["phases"].items():
+            for scope, key in (("Printer", entry["printer"]), ("Terminal", entry["terminal"])):
+                if key:
+                    grouped.setdefault((scope, key, phase), []).append(ms)
+
+    for (scope, key, phase), values in grouped.items():
+        update_latency_row(scope, key, phase, values)
+
+    frappe.db.commit()
+
+
+def update_latency_row(scope, scope_key, phase, values):
+    """Append samples to the row's ring buffer and recompute its percentiles."""
+    name = frappe.db.get_value(
+        "NextPOS Print Latency",
+        {"scope": scope, "scope_key": scope_key, "phase": phase},
+    )
+    if name:
+        doc = frappe.get_doc("NextPOS Print Latency", name)
+    else:
+        doc = frappe.new_doc("NextPOS Print Latency")
+        doc.update({"scope": scope, "scope_key": scope_key, "phase": phase, "sample_count": 0})
+
+    window = [cint(v) for v in (doc.recent_samples or "").split(",") if v]
+    window = (window + values)[-WINDOW_SIZE:]
+    ordered = sorted(window)
+
+    doc.recent_samples = ",".join(str(v) for v in window)
+    doc.sample_count = cint(doc.sample_count) + len(values)
+    doc.last_sample_on = now_datetime()
+    doc.p50_ms = percentile(ordered, 50)
+    doc.p90_ms = percentile(ordered, 90)
+    doc.p99_ms = percentile(ordered, 99)
+    doc.max_ms = ordered[-1]
+    doc.flags.ignore_permissions = True
+    doc.save()
@@ -0,0 +1,58 @@
+"""
+Cache warm-up for NextPOS Printing.
+Runs when a POS Opening Entry is submitted so the first receipts of a
+shift don't pay for cold settings, company and customer data.
+
+Only the shared Redis caches are warmed. Compiled layouts and the parsed
+QZ signing key live in each web process, so warming them here would only
+help the one process that handled the submit.
+"""
+import time
+
+import frappe
+from frappe.utils import add_days, today
+
+from nextpos_printing.printing.receipt import get_cached_company_info, get_cached_customer_info
+from nextpos_printing.utils.settings import get_client_settings, get_printer_for_pos
+
+TOP_CUSTOMERS = 50  # most frequent customers of the profile to pre-load
+RECENT_DAYS = 30
+
+
+def warm_pos_caches(doc, method=None):
+    """POS Opening Entry on_submit hook. Never blocks the submit on failure."""
+    start = time.monotonic()
+    try:
+        stats = warm_print_caches(doc.pos_profile, doc.company)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "NextPOS Cache Warm-up Error")
+        return
+
+    elapsed_ms = round((time.monotonic() - start) * 1000)
+    message = f"NextPOS print caches warmed in {elapsed_ms} ms ({stats['customers']} customers)"
+    doc.add_comment("Info", message)
+    frappe.logger("nextpos_printing").info(f"{doc.name}: {message}")
+
+
+def warm_print_caches(pos_profile, company):
+    """Load the shared caches the print path reads for pos_profile. Returns counts."""
+    get_printer_for_pos(pos_profile)
+    get_client_settings()
+    get_cached_company_info(company)
+
+    customers = frappe.get_all(
+        "POS Invoice",
+        filters={
+            "pos_profile": pos_profile,
+            "docstatus": 1,
+            "posting_date": [">=", add_days(today(), -RECENT_DAYS)],
+        },
+        fields=["customer", "count(name) as invoice_count"],
+        group_by="customer",
+        order_by="invoice_count desc",
+        limit=TOP_CUSTOMERS,
+    )
+    for row in customers:
+        get_cached_customer_info(row.customer)
+
+    return {"customers": len(customers)}